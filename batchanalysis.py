@@ -0,0 +1,181 @@
+import argparse
+import chess
+import json
+import math
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Iterator, Optional, Tuple
+
+from kewgame import Compooterchess
+from openingbook import readgames
+
+# Per worker engine, kept warm between the positions it gets.
+_engine = None
+_limits = {}
+
+
+def readpositions(paths, every: int = 1) -> Iterator[Tuple[str, Optional[str], Optional[str]]]:
+    """Stream (id, fen, error) for every position to analyse, one game or EPD line at a time.
+
+    PGN games yield each position before a mainline move (every n-th ply);
+    EPD files yield one position per non-empty line. A line that does not
+    parse, or sets up an impossible position, yields fen None and the error,
+    so it gets an error record instead of stopping the run.
+    """
+    for path in paths:
+        if path.lower().endswith((".epd", ".fen")):
+            with open(path, encoding="utf-8", errors="replace") as handle:
+                for lineno, line in enumerate(handle, 1):
+                    line = line.strip()
+                    if not line or line.startswith("#"):
+                        continue
+                    try:
+                        board, _ = chess.Board.from_epd(line)
+                    except ValueError as error:
+                        yield f"{path}:{lineno}", None, str(error)
+                        continue
+                    if not board.is_valid():
+                        yield f"{path}:{lineno}", None, "invalid position"
+                    elif not board.is_game_over():
+                        yield f"{path}:{lineno}", board.fen(), None
+            continue
+
+        for gameno, game in enumerate(readgames([path]), 1):
+            board = game.board()
+            for ply, move in enumerate(game.mainline_moves()):
+                if ply % every == 0:
+                    yield f"{path}:{gameno}:{ply}", board.fen(), None
+                board.push(move)
+
+
+def _initworker(options: dict, limits: dict):
+    global _engine, _limits
+    _engine = Compooterchess(**options)
+    _limits = limits
+
+
+def _analyse(positionid: str, fen: str) -> dict:
+    board = chess.Board(fen)
+    result = _engine.search(board, **_limits)
+    mate = None
+    if abs(result.score) == math.inf:
+        mate = "white" if result.score > 0 else "black"
+    return {
+        "id": positionid, "fen": fen,
+        "move": result.move.uci() if result.move else None,
+        "san": board.san(result.move) if result.move else None,
+        "score": None if mate else result.score, "mate": mate,
+        "depth": result.depth, "nodes": result.nodes, "seconds": round(result.seconds, 4),
+    }
+
+
+def resumepoint(outpath: str) -> int:
+    """Number of complete result lines already in outpath; a torn last line is cut off"""
+    if not os.path.exists(outpath):
+        return 0
+    done = 0
+    good = 0
+    with open(outpath, "rb") as handle:
+        for line in handle:
+            if not line.endswith(b"\n"):
+                break
+            done += 1
+            good += len(line)
+    if good != os.path.getsize(outpath):
+        with open(outpath, "r+b") as handle:
+            handle.truncate(good)
+    return done
+
+
+def analyse(paths, outpath: str, workers: Optional[int] = None, depth: int = 3, timelimit: Optional[float] = None,
+            nodelimit: Optional[int] = None, every: int = 1, engineoptions: Optional[dict] = None,
+            queuesize: Optional[int] = None, log=print) -> int:
+    """Analyse every position of paths into outpath (JSONL), resuming after what it already holds.
+
+    Positions go to a process pool with at most queuesize of them in flight,
+    so neither the input nor the results are ever held in memory whole.
+    Results are written in input order, which is what makes the output file
+    its own checkpoint. Input lines that do not parse, and positions whose
+    analysis fails, get an error record in their place.
+    Returns the number of positions analysed this run.
+    """
+    workers = workers or os.cpu_count() or 1
+    queuesize = queuesize or workers * 4
+    options = dict(engineoptions or {}, thinkinlevel=depth)
+    limits = {"timelimit": timelimit, "nodelimit": nodelimit}
+
+    skip = resumepoint(outpath)
+    if skip:
+        log(f"Resuming after {skip} positions already in {outpath}")
+
+    pending = {}
+    finished = {}
+    nextindex = skip
+    written = 0
+    started = time.time()
+    source = enumerate(readpositions(paths, every))
+    exhausted = False
+    with ProcessPoolExecutor(workers, initializer=_initworker, initargs=(options, limits)) as pool, \
+            open(outpath, "a", encoding="utf-8") as out:
+        while True:
+            while not exhausted and len(pending) + len(finished) < queuesize:
+                item = next(source, None)
+                if item is None:
+                    exhausted = True
+                    break
+                index, (positionid, fen, error) = item
+                if index < skip:
+                    continue
+                if error is not None:
+                    log(f"Skipping {positionid}: {error}")
+                    finished[index] = {"id": positionid, "fen": None, "error": error}
+                else:
+                    pending[pool.submit(_analyse, positionid, fen)] = index, positionid, fen
+            if not pending and not finished:
+                break
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED) if pending else (set(), None)
+            for future in done:
+                index, positionid, fen = pending.pop(future)
+                try:
+                    finished[index] = future.result()
+                except Exception as error:
+                    log(f"Analysis of {positionid} failed: {error!r}")
+                    finished[index] = {"id": positionid, "fen": fen, "error": repr(error)}
+            before = written
+            while nextindex in finished:
+                out.write(json.dumps(finished.pop(nextindex)) + "\n")
+                nextindex += 1
+                written += 1
+            out.flush()
+            if written // 100 > before // 100:
+                elapsed = time.time() - started
+                log(f"{skip + written} positions done, {written / elapsed:.1f}/s")
+    return written
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Analyse PGN/EPD positions with Compooterchess into JSONL")
+    parser.add_argument("inputs", nargs="+", help="PGN or EPD files")
+    parser.add_argument("--out", required=True, help="JSONL output, resumed if it already exists")
+    parser.add_argument("--workers", type=int, help="worker processes (default: all cores)")
+    parser.add_argument("--depth", type=int, default=3, help="search depth when no time/node limit is given")
+    parser.add_argument("--time", type=float, help="seconds per position")
+    parser.add_argument("--nodes", type=int, help="nodes per position")
+    parser.add_argument("--every", type=int, default=1, help="analyse every n-th ply of PGN games")
+    parser.add_argument("--selective", action="store_true", help="enable PVS, null move, LMR and quiescence")
+    args = parser.parse_args(argv)
+
+    engineoptions = {}
+    if args.selective:
+        engineoptions = {"pvs": True, "nullmove": True, "lmr": True, "quiescence": True}
+    count = analyse(args.inputs, args.out, workers=args.workers, depth=args.depth, timelimit=args.time,
+                    nodelimit=args.nodes, every=args.every, engineoptions=engineoptions)
+    print(f"Analysed {count} positions into {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
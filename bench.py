@@ -0,0 +1,204 @@
+import argparse
+import chess
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from typing import List, Optional
+
+from kewgame import Compooterchess
+from position import Position, perft as positionperft
+
+# Standard perft positions with known node counts per depth (depth 1 first).
+PERFT_POSITIONS = [
+    ("startpos", chess.STARTING_FEN, [20, 400, 8902, 197281]),
+    ("kiwipete", "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1", [48, 2039, 97862, 4085603]),
+    ("position3", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1", [14, 191, 2812, 43238]),
+    ("position4", "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1", [6, 264, 9467, 422333]),
+    ("position5", "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8", [44, 1486, 62379, 2103487]),
+    ("position6", "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10", [46, 2079, 89890, 3894594]),
+]
+
+# Positions the search is timed on: opening, middlegames, tactics, endgames.
+SEARCH_POSITIONS = [
+    ("startpos", chess.STARTING_FEN),
+    ("open-game", "r1bqkbnr/pppp1ppp/2n5/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R w KQkq - 2 3"),
+    ("kiwipete", "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1"),
+    ("middlegame", "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P3/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10"),
+    ("black-to-move", "rnbqkb1r/pp2pppp/3p1n2/8/3NP3/8/PPP2PPP/RNBQKB1R b KQkq - 1 5"),
+    ("rook-endgame", "8/5pk1/6p1/8/3R4/6P1/5PK1/r7 w - - 0 40"),
+    ("pawn-endgame", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1"),
+]
+
+
+def perft(board: chess.Board, depth: int) -> int:
+    if depth == 1:
+        return board.legal_moves.count()
+    nodes = 0
+    for move in board.legal_moves:
+        board.push(move)
+        nodes += perft(board, depth - 1)
+        board.pop()
+    return nodes
+
+
+def runperft(depth: int, fastboard: bool = True) -> List[dict]:
+    """Perft of every PERFT_POSITIONS entry on Position (or chess.Board), checked against the known counts"""
+    results = []
+    for name, fen, expected in PERFT_POSITIONS:
+        board = chess.Board(fen)
+        start = time.perf_counter()
+        nodes = positionperft(Position(board), depth) if fastboard else perft(board, depth)
+        seconds = time.perf_counter() - start
+        results.append({
+            "name": name, "fen": fen, "depth": depth, "nodes": nodes,
+            "expected": expected[depth - 1] if depth <= len(expected) else None,
+            "ok": depth > len(expected) or nodes == expected[depth - 1],
+            "seconds": seconds, "nps": nodes / seconds if seconds else 0,
+        })
+    return results
+
+
+def runsearch(fen: str, engineoptions: dict, depth: Optional[int] = None, timelimit: Optional[float] = None,
+              memory: bool = True) -> dict:
+    """One search from a cold engine, timed without tracemalloc and, if asked, repeated to measure memory"""
+    board = chess.Board(fen)
+    engine = Compooterchess(thinkinlevel=depth or 3, **engineoptions)
+    start = time.perf_counter()
+    move = engine.bestMoveornot(board, timelimit=timelimit)
+    seconds = time.perf_counter() - start
+    result = {
+        "move": move.uci() if move else None, "depth": engine.depthreached, "score": engine.lastscore,
+        "nodes": engine.nodes, "seconds": seconds, "nps": engine.nodes / seconds if seconds else 0,
+        "depthtimes": engine.depthtimes, "peakkb": None,
+    }
+    if memory and depth is not None:
+        engine = Compooterchess(thinkinlevel=depth, **engineoptions)
+        tracemalloc.start()
+        engine.bestMoveornot(chess.Board(fen))
+        result["peakkb"] = tracemalloc.get_traced_memory()[1] / 1024
+        tracemalloc.stop()
+    return result
+
+
+def totals(rows: List[dict]) -> dict:
+    nodes = sum(row["nodes"] for row in rows)
+    seconds = sum(row["seconds"] for row in rows)
+    return {"nodes": nodes, "seconds": seconds, "nps": nodes / seconds if seconds else 0}
+
+
+def runbench(perftdepth: int, depth: int, timelimit: float, engineoptions: dict, memory: bool = True,
+             log=print) -> dict:
+    report = {
+        "meta": {
+            "python": platform.python_version(), "chess": chess.__version__, "machine": platform.machine(),
+            "date": time.strftime("%Y-%m-%d %H:%M:%S"), "perftdepth": perftdepth, "depth": depth,
+            "timelimit": timelimit, "engine": engineoptions,
+        },
+        "perft": runperft(perftdepth, engineoptions.get("fastboard", True)) if perftdepth else [],
+        "fixeddepth": [],
+        "fixedtime": [],
+    }
+    for row in report["perft"]:
+        log(f"perft {row['name']:<14} d{row['depth']} {row['nodes']:>9} nodes {row['nps']:>10.0f} nps"
+            f"{'' if row['ok'] else '  MISMATCH, expected ' + str(row['expected'])}")
+
+    for name, fen in SEARCH_POSITIONS:
+        if depth:
+            row = dict(runsearch(fen, engineoptions, depth=depth, memory=memory), name=name, fen=fen)
+            report["fixeddepth"].append(row)
+            peak = f"{row['peakkb']:>8.0f} KiB" if row["peakkb"] is not None else ""
+            log(f"depth {name:<14} d{row['depth']} {row['nodes']:>8} nodes {row['seconds']:>7.2f}s "
+                f"{row['nps']:>8.0f} nps {peak}")
+        if timelimit:
+            row = dict(runsearch(fen, engineoptions, timelimit=timelimit, memory=False), name=name, fen=fen)
+            report["fixedtime"].append(row)
+            log(f"time  {name:<14} d{row['depth']} {row['nodes']:>8} nodes {row['seconds']:>7.2f}s "
+                f"{row['nps']:>8.0f} nps")
+
+    report["totals"] = {
+        "perft": totals(report["perft"]),
+        "fixeddepth": totals(report["fixeddepth"]),
+        "fixedtime": totals(report["fixedtime"]),
+    }
+    return report
+
+
+# Settings two runs must share for their timings to be comparable.
+COMPARED_META = ("perftdepth", "depth", "timelimit", "engine")
+
+
+def metamismatches(report: dict, baseline: dict) -> List[str]:
+    """Settings in which report and baseline differ, so their numbers measure different work"""
+    old = baseline.get("meta", {})
+    return [f"{field}: {report['meta'][field]!r} here, {old.get(field)!r} in the baseline"
+            for field in COMPARED_META if report["meta"][field] != old.get(field)]
+
+
+def compare(report: dict, baseline: dict, threshold: float) -> List[str]:
+    """Throughput regressions of report against baseline, worse by more than threshold (a fraction).
+
+    Only meaningful when metamismatches(report, baseline) is empty.
+    """
+    problems = [f"perft {row['name']}: {row['nodes']} nodes, expected {row['expected']}"
+                for row in report["perft"] if not row["ok"]]
+    for section in ("perft", "fixeddepth", "fixedtime"):
+        old = baseline.get("totals", {}).get(section, {}).get("nps")
+        new = report["totals"][section]["nps"]
+        if old and new < old * (1 - threshold):
+            problems.append(f"{section}: {new:.0f} nps vs {old:.0f} baseline ({new / old - 1:+.1%})")
+        oldrows = {row["name"]: row for row in baseline.get(section, [])}
+        for row in report[section]:
+            oldrow = oldrows.get(row["name"])
+            if oldrow and oldrow.get("nps") and row["nps"] < oldrow["nps"] * (1 - threshold):
+                problems.append(f"{section} {row['name']}: {row['nps']:.0f} nps vs {oldrow['nps']:.0f} baseline")
+    return problems
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Perft and search benchmarks for Compooterchess")
+    parser.add_argument("--perft", type=int, default=3, help="perft depth, 0 to skip")
+    parser.add_argument("--depth", type=int, default=3, help="fixed search depth, 0 to skip")
+    parser.add_argument("--time", type=float, default=1.0, help="seconds per fixed-time search, 0 to skip")
+    parser.add_argument("--selective", action="store_true", help="enable PVS, null move, LMR and quiescence")
+    parser.add_argument("--chessboard", action="store_true", help="search and perft on chess.Board, not Position")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc peak memory runs")
+    parser.add_argument("--out", help="write the results as JSON here")
+    parser.add_argument("--baseline", help="JSON results to compare against")
+    parser.add_argument("--threshold", type=float, default=10, help="allowed nps drop in percent")
+    args = parser.parse_args(argv)
+
+    engineoptions = {}
+    if args.selective:
+        engineoptions = {"pvs": True, "nullmove": True, "lmr": True, "quiescence": True}
+    if args.chessboard:
+        engineoptions["fastboard"] = False
+    report = runbench(args.perft, args.depth, args.time, engineoptions, memory=not args.no_memory)
+    for section, total in report["totals"].items():
+        print(f"total {section:<10} {total['nodes']:>9} nodes {total['seconds']:>7.2f}s {total['nps']:>9.0f} nps")
+
+    if args.out:
+        with open(args.out, "w") as handle:
+            json.dump(report, handle, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as handle:
+            baseline = json.load(handle)
+        mismatches = metamismatches(report, baseline)
+        if mismatches:
+            for mismatch in mismatches:
+                print(f"BASELINE MISMATCH {mismatch}")
+            print("Not comparing against a baseline run with different settings")
+            return 2
+        problems = compare(report, baseline, args.threshold / 100)
+        for problem in problems:
+            print(f"REGRESSION {problem}")
+        if problems:
+            return 1
+        print("No regressions against baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
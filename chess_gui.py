@@ -4,6 +4,7 @@ import chess
 from pygame.locals import *
 import time
 from kewgame import wholeechess  # Import the correct class
+from searchthread import SearchThread
 
 # Initialize pygame
 pygame.init()
@@ -31,6 +32,73 @@ SHADOW_COLOR = (30, 30, 30, 100)  # Subtle shadow for depth
 TITLE_FONT = pygame.font.SysFont('Georgia', 64, bold=True)
 SUBTITLE_FONT = pygame.font.SysFont('Arial', 28, italic=True)
 BUTTON_FONT = pygame.font.SysFont('Arial', 36, bold=True)
+MOVE_FONT = pygame.font.SysFont('Arial', 18)
+STATUS_FONT = pygame.font.SysFont('Arial', 22, italic=True)
+
+# Lines of move history shown in the info panel
+HISTORY_LINES = 10
+
+# Frame rates: normal, and once nothing has changed for IDLE_AFTER frames
+FPS = 60
+IDLE_FPS = 10
+IDLE_AFTER = 30
+# Steps per second of the welcome subtitle pulse
+PULSE_FPS = 8
+
+# Screen areas redrawn on their own
+WELCOME_ANIMATED = [pygame.Rect(0, 240, SCREEN_WIDTH, 60), pygame.Rect(0, 345, SCREEN_WIDTH, 90)]
+INFO_RECT = pygame.Rect(MARGIN + BOARD_SIZE + 1, 0, SCREEN_WIDTH - MARGIN - BOARD_SIZE - 1, MARGIN + BOARD_SIZE)
+STATUS_RECT = pygame.Rect(0, MARGIN + BOARD_SIZE + 1, SCREEN_WIDTH, SCREEN_HEIGHT - MARGIN - BOARD_SIZE - 1)
+
+# Posted by the search thread when the AI has picked a move
+AI_MOVE_EVENT = pygame.USEREVENT + 1
+
+class MoveHistory:
+    """SAN move list for the info panel, built as moves are played instead of replaying the game.
+
+    Each line is rendered once, when its move is added. The panel shows a
+    page of the list and can be scrolled back; at offset 0 it follows the
+    latest move.
+    """
+
+    def __init__(self, font, lines=HISTORY_LINES):
+        self.font = font
+        self.lines = lines
+        self.clear()
+
+    def clear(self):
+        self.sans = []
+        self.surfaces = []
+        self.offset = 0
+
+    def push(self, board, move):
+        """Record move; call before pushing it on board, since SAN needs the position before"""
+        san = board.san(move)
+        self.sans.append(san)
+        self.surfaces.append(self.font.render(f"{len(self.sans)}. {san}", True, BLACK))
+
+    def sync(self, board):
+        """Rebuild from board's move stack, only needed when moves were pushed behind our back"""
+        if len(self.sans) == len(board.move_stack):
+            return
+        self.clear()
+        replay = chess.Board()
+        for move in board.move_stack:
+            self.push(replay, move)
+            replay.push(move)
+
+    def scroll(self, lines):
+        """Scroll back (positive) or forward (negative) through older moves"""
+        most = max(0, len(self.surfaces) - self.lines)
+        self.offset = min(max(self.offset + lines, 0), most)
+
+    def visible(self):
+        end = len(self.surfaces) - self.offset
+        return self.surfaces[max(0, end - self.lines):end]
+
+    def draw(self, screen, x, y):
+        for i, surface in enumerate(self.visible()):
+            screen.blit(surface, (x, y + i * 20))
 
 class ChessGUI:
     def __init__(self):
@@ -42,7 +110,25 @@ class ChessGUI:
         self.valid_moves = []
         self.game = None
         self.load_images()
+        self.build_layers()
         self.button_scale = 1.0  # For button hover animation
+        self.rendered_state = None  # State on screen; a change means a full redraw
+        self.drawn_squares = {}
+        self.panel_state = None
+        self.status_state = None
+        self.welcome_button = pygame.Rect(0, 0, 0, 0)
+        self.end_button = pygame.Rect(0, 0, 0, 0)
+        self.idle_frames = 0
+        self.welcome_drawn = None  # (subtitle scale, button scale) on screen
+        self.ambient = False  # Last frame only advanced the welcome subtitle pulse
+        self.history = MoveHistory(MOVE_FONT)
+        self.turn_surfaces = {
+            chess.WHITE: BUTTON_FONT.render("Current Turn: White", True, BLACK),
+            chess.BLACK: BUTTON_FONT.render("Current Turn: Black", True, BLACK),
+        }
+        self.search = None  # Background SearchThread, thinking or pondering
+        self.searchid = 0
+        self.pondermove = None
 
     def load_images(self):
         """Load chess piece images"""
@@ -59,20 +145,19 @@ class ChessGUI:
                     self.piece_images = None
                     return
 
-    def draw_welcome_screen(self):
-        """Draw a world-class welcome screen"""
-        # Background with gradient
-        gradient = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
+    def build_layers(self):
+        """Pre-render everything that never changes: backgrounds, board squares, highlights, piece sprites"""
+        square_size = BOARD_SIZE // 8
+
+        # Welcome background with gradient, board pattern and title
+        self.welcome_layer = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
         for y in range(SCREEN_HEIGHT):
             t = y / SCREEN_HEIGHT
             r = int(LIGHT_SQUARE[0] * (1 - t) + DARK_SQUARE[0] * t)
             g = int(LIGHT_SQUARE[1] * (1 - t) + DARK_SQUARE[1] * t)
             b = int(LIGHT_SQUARE[2] * (1 - t) + DARK_SQUARE[2] * t)
-            pygame.draw.line(gradient, (r, g, b), (0, y), (SCREEN_WIDTH, y))
-        self.screen.blit(gradient, (0, 0))
+            pygame.draw.line(self.welcome_layer, (r, g, b), (0, y), (SCREEN_WIDTH, y))
 
-        # Chessboard pattern overlay (subtle)
-        square_size = BOARD_SIZE // 8
         overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
         for row in range(8):
             for col in range(8):
@@ -82,120 +167,156 @@ class ChessGUI:
                                 (MARGIN + col * square_size, 
                                  MARGIN + row * square_size, 
                                  square_size, square_size))
-        self.screen.blit(overlay, (0, 0))
+        self.welcome_layer.blit(overlay, (0, 0))
 
-        # Title with shadow effect
         title = TITLE_FONT.render("Waleed's Chess Game", True, BLACK)
         title_shadow = TITLE_FONT.render("Waleed's Chess Game", True, SHADOW_COLOR)
-        self.screen.blit(title_shadow, (SCREEN_WIDTH//2 - title.get_width()//2 + 5, 155))
-        self.screen.blit(title, (SCREEN_WIDTH//2 - title.get_width()//2, 150))
+        self.welcome_layer.blit(title_shadow, (SCREEN_WIDTH//2 - title.get_width()//2 + 5, 155))
+        self.welcome_layer.blit(title, (SCREEN_WIDTH//2 - title.get_width()//2, 150))
+
+        if self.piece_images:
+            for i, piece in enumerate(['white_king', 'black_queen', 'white_bishop', 'black_knight']):
+                img = self.piece_images.get(piece)
+                if img:
+                    self.welcome_layer.blit(img, (MARGIN + i * 150, MARGIN + 400))
+
+        self.subtitle = SUBTITLE_FONT.render("Master the Board, Challenge the World!", True, BLACK)
+        self.start_text = BUTTON_FONT.render("Start Game", True, WHITE)
+
+        # Empty board
+        self.board_layer = pygame.Surface((BOARD_SIZE, BOARD_SIZE))
+        for row in range(8):
+            for col in range(8):
+                color = LIGHT_SQUARE if (row + col) % 2 == 0 else DARK_SQUARE
+                pygame.draw.rect(self.board_layer, color, 
+                                (col * square_size, row * square_size, square_size, square_size))
+
+        self.highlights = {}
+        for kind, color in (("selected", HIGHLIGHT), ("move", MOVE_HIGHLIGHT)):
+            highlight = pygame.Surface((square_size, square_size), pygame.SRCALPHA)
+            highlight.fill(color)
+            self.highlights[kind] = highlight
+
+        # One sprite per piece, centred in a transparent square
+        self.piece_sprites = {}
+        for color in chess.COLORS:
+            for piece_type in chess.PIECE_TYPES:
+                piece = chess.Piece(piece_type, color)
+                piece_name = f"{'white' if color == chess.WHITE else 'black'}_{chess.piece_name(piece_type)}"
+                sprite = pygame.Surface((square_size, square_size), pygame.SRCALPHA)
+                if self.piece_images and piece_name in self.piece_images:
+                    sprite.blit(self.piece_images[piece_name], (10, 10))
+                else:
+                    piece_text = BUTTON_FONT.render(piece.symbol(), True, 
+                                                   WHITE if color == chess.WHITE else BLACK)
+                    sprite.blit(piece_text, (square_size//2 - piece_text.get_width()//2, 
+                                             square_size//2 - piece_text.get_height()//2))
+                self.piece_sprites[piece.symbol()] = sprite
+
+    def welcome_state(self):
+        """What the animated parts of the welcome screen should show: (subtitle scale, button scale)"""
+        # Update button scale for hover animation
+        if self.welcome_button.collidepoint(pygame.mouse.get_pos()):
+            self.button_scale = min(self.button_scale + 0.02, 1.1)
+        else:
+            self.button_scale = max(self.button_scale - 0.02, 1.0)
+        # Gentle pulse, in steps so the subtitle is only redrawn PULSE_FPS times a second
+        phase = int(time.time() * PULSE_FPS) / PULSE_FPS
+        return 1.0 + 0.05 * (1 + phase % 2), self.button_scale
+
+    def draw_welcome_screen(self, subtitle_scale, rects=None):
+        """Draw a world-class welcome screen, or with rects only redraw those animated areas of it"""
+        if rects is None:
+            self.screen.blit(self.welcome_layer, (0, 0))
+        else:
+            for rect in rects:
+                self.screen.blit(self.welcome_layer, rect, rect)
 
         # Subtitle with animation (slight pulse)
-        subtitle = SUBTITLE_FONT.render("Master the Board, Challenge the World!", True, BLACK)
-        subtitle_scale = 1.0 + 0.05 * (1 + time.time() % 2)  # Gentle pulse
+        subtitle = self.subtitle
         scaled_subtitle = pygame.transform.smoothscale(subtitle, 
             (int(subtitle.get_width() * subtitle_scale), int(subtitle.get_height() * subtitle_scale)))
         self.screen.blit(scaled_subtitle, 
                         (SCREEN_WIDTH//2 - scaled_subtitle.get_width()//2, 250))
+        if rects is not None and WELCOME_ANIMATED[1] not in rects:
+            return rects
 
         # Start button with hover effect
         start_button = pygame.Rect(SCREEN_WIDTH//2 - 120 * self.button_scale, 
                                  350, 240 * self.button_scale, 70 * self.button_scale)
         pygame.draw.rect(self.screen, SHADOW_COLOR, start_button.move(5, 5), border_radius=15)
         pygame.draw.rect(self.screen, ACCENT_COLOR, start_button, border_radius=15)
-        start_text = BUTTON_FONT.render("Start Game", True, WHITE)
+        start_text = self.start_text
         self.screen.blit(start_text, 
                         (SCREEN_WIDTH//2 - start_text.get_width()//2, 
                          365 - start_text.get_height()//2 + 35 * (self.button_scale - 1)))
+        self.welcome_button = start_button
+        return rects
 
-        # Decorative chess pieces
-        if self.piece_images:
-            for i, piece in enumerate(['white_king', 'black_queen', 'white_bishop', 'black_knight']):
-                img = self.piece_images.get(piece)
-                if img:
-                    self.screen.blit(img, (MARGIN + i * 150, MARGIN + 400))
+    def square_rect(self, square):
+        square_size = BOARD_SIZE // 8
+        return pygame.Rect(MARGIN + chess.square_file(square) * square_size,
+                           MARGIN + (7 - chess.square_rank(square)) * square_size,
+                           square_size, square_size)
 
-        # Update button scale for hover animation
-        mouse_pos = pygame.mouse.get_pos()
-        if start_button.collidepoint(mouse_pos):
-            self.button_scale = min(self.button_scale + 0.02, 1.1)
-        else:
-            self.button_scale = max(self.button_scale - 0.02, 1.0)
+    def square_states(self):
+        """What each square should show: (piece symbol or None, highlight kind or None)"""
+        pieces = self.game.board.piece_map() if self.game else {}
+        targets = {move.to_square for move in self.valid_moves}
+        states = {}
+        for square in chess.SQUARES:
+            piece = pieces.get(square)
+            if square == self.selected_piece:
+                highlight = "selected"
+            elif square in targets:
+                highlight = "move"
+            else:
+                highlight = None
+            states[square] = (piece.symbol() if piece else None, highlight)
+        return states
 
-        return start_button
+    def draw_square(self, square, state):
+        rect = self.square_rect(square)
+        self.screen.blit(self.board_layer, rect, rect.move(-MARGIN, -MARGIN))
+        symbol, highlight = state
+        if highlight:
+            self.screen.blit(self.highlights[highlight], rect)
+        if symbol:
+            self.screen.blit(self.piece_sprites[symbol], rect)
+        return rect
 
     def draw_board(self):
         """Draw the chess board"""
-        square_size = BOARD_SIZE // 8
-        
-        for row in range(8):
-            for col in range(8):
-                color = LIGHT_SQUARE if (row + col) % 2 == 0 else DARK_SQUARE
-                pygame.draw.rect(self.screen, color, 
-                                (MARGIN + col * square_size, 
-                                 MARGIN + row * square_size, 
-                                 square_size, square_size))
-                
-                if self.selected_piece:
-                    file, rank = chess.square_file(self.selected_piece), chess.square_rank(self.selected_piece)
-                    if col == file and row == 7 - rank:
-                        highlight = pygame.Surface((square_size, square_size), pygame.SRCALPHA)
-                        highlight.fill(HIGHLIGHT)
-                        self.screen.blit(highlight, 
-                                        (MARGIN + col * square_size, 
-                                         MARGIN + row * square_size))
-                
-                for move in self.valid_moves:
-                    if col == chess.square_file(move.to_square) and row == 7 - chess.square_rank(move.to_square):
-                        highlight = pygame.Surface((square_size, square_size), pygame.SRCALPHA)
-                        highlight.fill(MOVE_HIGHLIGHT)
-                        self.screen.blit(highlight, 
-                                        (MARGIN + col * square_size, 
-                                         MARGIN + row * square_size))
+        self.screen.blit(self.board_layer, (MARGIN, MARGIN))
+        if self.selected_piece is not None:
+            self.screen.blit(self.highlights["selected"], self.square_rect(self.selected_piece))
+        for move in self.valid_moves:
+            self.screen.blit(self.highlights["move"], self.square_rect(move.to_square))
 
     def draw_pieces(self):
         """Draw chess pieces on the board"""
         if not self.game:
             return
-            
-        square_size = BOARD_SIZE // 8
-        
-        for row in range(8):
-            for col in range(8):
-                piece = self.game.board.piece_at(chess.square(col, row))
-                if piece:
-                    piece_name = f"{'white' if piece.color == chess.WHITE else 'black'}_{piece.symbol().lower()}"
-                    
-                    if self.piece_images and piece_name in self.piece_images:
-                        self.screen.blit(self.piece_images[piece_name], 
-                                       (MARGIN + col * square_size + 10, 
-                                        MARGIN + (7 - row) * square_size + 10))
-                    else:
-                        piece_text = BUTTON_FONT.render(piece.symbol(), True, 
-                                                       WHITE if piece.color == chess.WHITE else BLACK)
-                        self.screen.blit(piece_text, 
-                                        (MARGIN + col * square_size + square_size//2 - piece_text.get_width()//2, 
-                                         MARGIN + (7 - row) * square_size + square_size//2 - piece_text.get_height()//2))
+        for square, piece in self.game.board.piece_map().items():
+            self.screen.blit(self.piece_sprites[piece.symbol()], self.square_rect(square))
+        self.drawn_squares = self.square_states()
+
+    def update_board(self):
+        """Redraw only the squares whose piece or highlight changed; returns their rects"""
+        states = self.square_states()
+        dirty = [self.draw_square(square, state) for square, state in states.items()
+                 if self.drawn_squares.get(square) != state]
+        self.drawn_squares = states
+        return dirty
 
     def draw_game_info(self):
         """Draw game information"""
         if not self.game:
             return
             
-        turn_text = f"Current Turn: {'White' if self.game.board.turn == chess.WHITE else 'Black'}"
-        turn_surface = BUTTON_FONT.render(turn_text, True, BLACK)
-        self.screen.blit(turn_surface, (MARGIN + BOARD_SIZE + 20, MARGIN))
-        
-        move_history = []
-        temp_board = chess.Board()
-        for move in self.game.board.move_stack:
-            if move in temp_board.legal_moves:
-                move_history.append(temp_board.san(move))
-                temp_board.push(move)
-        
-        for i, move in enumerate(move_history[-10:]):
-            move_text = MOVE_FONT.render(f"{i+1}. {move}", True, BLACK)
-            self.screen.blit(move_text, (MARGIN + BOARD_SIZE + 20, MARGIN + 50 + i * 20))
+        self.screen.blit(self.turn_surfaces[self.game.board.turn], (MARGIN + BOARD_SIZE + 20, MARGIN))
+        self.history.sync(self.game.board)
+        self.history.draw(self.screen, MARGIN + BOARD_SIZE + 20, MARGIN + 50)
 
     def draw_end_screen(self):
         """Draw the end game screen"""
@@ -237,12 +358,13 @@ class ChessGUI:
                 if self.selected_piece:
                     move = chess.Move(self.selected_piece, square)
                     if move in self.game.board.legal_moves:
+                        self.history.push(self.game.board, move)
                         self.game.board.push(move)
                         self.selected_piece = None
                         self.valid_moves = []
                         
                         if not self.game.board.is_game_over():
-                            self.ai_move()
+                            self.ai_move(move)
                     else:
                         if piece and piece.color == chess.WHITE:
                             self.selected_piece = square
@@ -256,59 +378,204 @@ class ChessGUI:
                     self.valid_moves = [m for m in self.game.board.legal_moves 
                                       if m.from_square == square]
 
-    def ai_move(self):
-        """Let the AI make a move"""
-        if self.game.board.turn == chess.BLACK and not self.game.board.is_game_over():
-            start_time = time.time()
-            move = self.game.ai.bestMoveornot(self.game.board)
-            if move in self.game.board.legal_moves:
-                self.game.board.push(move)
-                print(f"AI moved: {self.game.board.san(move)} (took {time.time() - start_time:.2f}s)")
+    def ai_move(self, reply=None):
+        """Start the AI thinking in the background; the move arrives as an AI_MOVE_EVENT.
+
+        If the AI was pondering on reply the running search is kept and just
+        told to finish, otherwise a fresh search is started.
+        """
+        if self.game.board.turn != chess.BLACK or self.game.board.is_game_over():
+            return
+        if self.search and self.search.ponder and reply is not None and reply == self.pondermove:
+            budget = self.game.timecontrol.budget(self.game.board) if self.game.timecontrol else None
+            self.search.ponderhit(budget)
+            self.pondermove = None
+            return
+
+        self.stop_search()
+        self.searchid += 1
+        move = self.game.bookmove()
+        if move:
+            self.search_callback(self.searchid)(move, 0.0)
+            return
+        self.search = SearchThread(self.game.ai, self.game.board, self.search_callback(self.searchid),
+                                   timecontrol=self.game.timecontrol)
+        self.search.start()
+
+    def ponder(self):
+        """Keep searching on the reply we expect from the player while they think"""
+        self.pondermove = self.game.ai.expectedmove(self.game.board)
+        if self.pondermove is None:
+            return
+        board = self.game.board.copy()
+        board.push(self.pondermove)
+        if board.is_game_over():
+            self.pondermove = None
+            return
+        self.searchid += 1
+        self.search = SearchThread(self.game.ai, board, self.search_callback(self.searchid), ponder=True)
+        self.search.start()
+
+    def search_callback(self, searchid):
+        def post(move, elapsed):
+            pygame.event.post(pygame.event.Event(AI_MOVE_EVENT, move=move, elapsed=elapsed, searchid=searchid))
+        return post
+
+    def stop_search(self):
+        if self.search:
+            self.search.stop()
+        self.search = None
+        self.pondermove = None
+
+    def handle_ai_move(self, event):
+        """Play the move from a finished search, unless that search is stale"""
+        if event.searchid != self.searchid or self.game is None:
+            return
+        self.search = None
+        move = event.move
+        if self.game.timecontrol:
+            self.game.timecontrol.spend(event.elapsed)
+        if move in self.game.board.legal_moves:
+            self.history.push(self.game.board, move)
+            san = self.history.sans[-1]
+            self.game.board.push(move)
+            stats = self.game.ai.lastresult.summary() if event.elapsed else "book move"
+            print(f"AI moved: {san} (took {event.elapsed:.2f}s; {stats})")
+        if self.game.board.is_game_over():
+            self.state = "end"
+        else:
+            self.ponder()
+
+    def status_text(self):
+        """The line under the board: AI thinking, or how its last search went"""
+        if self.search and not self.search.ponder:
+            dots = "." * (int(time.time() * 3) % 4)
+            return f"AI thinking{dots}  depth {self.game.ai.depthreached}, {self.game.ai.nodes} nodes"
+        if self.game and self.game.ai.lastresult and self.game.board.move_stack:
+            result = self.game.ai.lastresult
+            return (f"AI: depth {result.depth}, {result.nodes} nodes, {result.nps:.0f} nps, "
+                    f"{result.seconds:.2f}s")
+        return ""
+
+    def draw_thinking(self):
+        """Show that the AI is thinking, with a little dot animation, or how its last search went"""
+        status = self.status_text()
+        if status:
+            status_surface = STATUS_FONT.render(status, True, BLACK)
+            self.screen.blit(status_surface, (MARGIN, MARGIN + BOARD_SIZE + 15))
+        return status
+
+    def render(self):
+        """Draw what changed since the last frame.
+
+        Returns the list of dirty rects to update, or None when the whole
+        screen was redrawn and needs a flip.
+        """
+        full = self.state != self.rendered_state
+        self.rendered_state = self.state
+
+        self.ambient = False
+        if self.state == "welcome":
+            state = self.welcome_state()
+            if full:
+                self.welcome_drawn = state
+                self.draw_welcome_screen(state[0])
+                return None
+            if state == self.welcome_drawn:
+                return []
+            # Only the subtitle pulse moved: redraw it, but let the frame rate drop.
+            self.ambient = state[1] == self.welcome_drawn[1]
+            self.welcome_drawn = state
+            return self.draw_welcome_screen(state[0], WELCOME_ANIMATED[:1] if self.ambient else WELCOME_ANIMATED)
+
+        if full:
+            self.screen.fill(WHITE)
+            self.draw_board()
+            self.draw_pieces()
+            self.draw_game_info()
+            self.panel_state = self.info_state()
+            self.status_state = self.draw_thinking()
+            if self.state == "end":
+                self.end_button = self.draw_end_screen()
+            return None
+        if self.state == "end":
+            return []
+
+        dirty = self.update_board()
+        if self.info_state() != self.panel_state:
+            self.panel_state = self.info_state()
+            self.screen.fill(WHITE, INFO_RECT)
+            self.draw_game_info()
+            dirty.append(INFO_RECT)
+        status = self.status_text()
+        if status != self.status_state:
+            self.screen.fill(WHITE, STATUS_RECT)
+            self.status_state = self.draw_thinking()
+            dirty.append(STATUS_RECT)
+        return dirty
+
+    def info_state(self):
+        if not self.game:
+            return None
+        return (self.game.board.turn, len(self.game.board.move_stack), self.history.offset)
+
+    def new_game(self):
+        self.stop_search()
+        self.game = wholeechess()  # Use the correct class
+        self.history.clear()
+        self.state = "game"
+        self.selected_piece = None
+        self.valid_moves = []
 
     def run(self):
         """Main game loop"""
         while True:
             for event in pygame.event.get():
+                self.idle_frames = 0
                 if event.type == QUIT:
+                    self.stop_search()
                     pygame.quit()
                     sys.exit()
                 
+                if event.type == AI_MOVE_EVENT:
+                    self.handle_ai_move(event)
+
                 if event.type == MOUSEBUTTONDOWN:
                     if self.state == "welcome":
-                        start_button = self.draw_welcome_screen()
-                        if start_button.collidepoint(event.pos):
-                            self.game = wholeechess()  # Use the correct class
-                            self.state = "game"
+                        if self.welcome_button.collidepoint(event.pos):
+                            self.new_game()
                     
                     elif self.state == "game":
                         self.handle_click(event.pos)
                         if self.game.board.is_game_over():
+                            self.stop_search()
                             self.state = "end"
                     
                     elif self.state == "end":
-                        again_button = self.draw_end_screen()
-                        if again_button.collidepoint(event.pos):
-                            self.game = wholeechess()  # Use the correct class
-                            self.state = "game"
-                            self.selected_piece = None
-                            self.valid_moves = []
-            
-            self.screen.fill(WHITE)
-            
-            if self.state == "welcome":
-                start_button = self.draw_welcome_screen()
-            elif self.state == "game":
-                self.draw_board()
-                self.draw_pieces()
-                self.draw_game_info()
-            elif self.state == "end":
-                self.draw_board()
-                self.draw_pieces()
-                self.draw_game_info()
-                again_button = self.draw_end_screen()
+                        if self.end_button.collidepoint(event.pos):
+                            self.new_game()
+
+                if event.type == MOUSEWHEEL and self.game:
+                    self.history.scroll(event.y)
+
+                if event.type == KEYDOWN and self.game:
+                    if event.key == K_PAGEUP:
+                        self.history.scroll(HISTORY_LINES)
+                    elif event.key == K_PAGEDOWN:
+                        self.history.scroll(-HISTORY_LINES)
+                    elif event.key == K_END:
+                        self.history.offset = 0
             
-            pygame.display.flip()
-            self.clock.tick(60)
+            dirty = self.render()
+            if dirty is None:
+                pygame.display.flip()
+            elif dirty:
+                pygame.display.update(dirty)
+
+            # Drop the frame rate when nothing has changed for a while
+            changed = dirty is None or (dirty and not self.ambient)
+            self.idle_frames = 0 if changed else self.idle_frames + 1
+            self.clock.tick(IDLE_FPS if self.idle_frames > IDLE_AFTER else FPS)
 
 if __name__ == "__main__":
     gui = ChessGUI()
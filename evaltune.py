@@ -0,0 +1,281 @@
+import argparse
+import chess
+import sys
+import time
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from evaluation import CENTER_SQUARES, Evaluator
+from nodecontext import NodeContext
+from openingbook import readgames
+from position import Position
+
+# Feature vector layout, one row per position. Every term of Evaluator.evaluate
+# is linear in these, so a batch scores with a single matrix product.
+PLANES = 6 * 64           # piece planes: +1 White piece on s, -1 Black piece on mirror(s)
+CAPTURE = PLANES          # 6 one-hot: piece type the last move captured
+THREAT = CAPTURE + 6      # 6 counts: legal captures of each piece type
+MOBILITY = THREAT + 6     # legal move count, negative with Black to move
+CENTER = MOBILITY + 1     # centre squares held by the side to move
+FEATURES = CENTER + 1
+
+RESULTS = {"1-0": 1.0, "0-1": 0.0, "1/2-1/2": 0.5}
+CENTER_MASK = sum(chess.BB_SQUARES[square] for square in CENTER_SQUARES)
+CHUNK = 65536
+
+
+class FeatureBatch(NamedTuple):
+    """Packed features of n positions: bitboards (n, 2, 6) uint64 by [color][piece type - 1],
+    the other terms (n, 14) int16 and the game results (n,) float32 from White's side"""
+    bitboards: np.ndarray
+    extras: np.ndarray
+    results: np.ndarray
+
+    def save(self, path: str):
+        np.savez_compressed(path, bitboards=self.bitboards, extras=self.extras, results=self.results)
+
+    @classmethod
+    def load(cls, path: str) -> "FeatureBatch":
+        data = np.load(path)
+        return cls(data["bitboards"], data["extras"], data["results"])
+
+
+def readlabeled(paths: Iterable[str], skipplies: int = 8, log=None) -> Iterator[Tuple[Position, float]]:
+    """(position, White's result) from PGN games and EPD lines with a c9 or result opcode.
+
+    PGN positions are yielded from one Position that moves on after each
+    yield, so use each one before asking for the next. EPD lines that do not
+    parse and impossible positions are skipped (and logged, given log).
+    """
+    for path in paths:
+        if path.lower().endswith(".epd"):
+            with open(path, encoding="utf-8", errors="replace") as handle:
+                for lineno, line in enumerate(handle, 1):
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        board, ops = chess.Board.from_epd(line)
+                    except ValueError as error:
+                        if log:
+                            log(f"Skipping {path}:{lineno}: {error}")
+                        continue
+                    if not board.is_valid():
+                        if log:
+                            log(f"Skipping {path}:{lineno}: invalid position")
+                        continue
+                    result = RESULTS.get(str(ops.get("c9", ops.get("result", ""))).strip())
+                    if result is not None:
+                        yield Position(board), result
+            continue
+        for gameno, game in enumerate(readgames([path]), 1):
+            result = RESULTS.get(game.headers.get("Result", "*"))
+            if result is None:
+                continue
+            board = game.board()
+            if not board.is_valid():
+                if log:
+                    log(f"Skipping {path}:{gameno}: invalid start position")
+                continue
+            position = Position(board)
+            for ply, move in enumerate(game.mainline_moves()):
+                position.push(move)
+                if ply + 1 >= skipplies:
+                    yield position, result
+
+
+def positionfeatures(board) -> Optional[Tuple[List[int], List[int]]]:
+    """(bitboards, extras) of board, None if the game is over there"""
+    node = NodeContext(board, False)
+    if node.terminal:
+        return None
+    pieces = (board.pawns, board.knights, board.bishops, board.rooks, board.queens, board.kings)
+    bitboards = [board.occupied_co[color] & bb for color in (chess.BLACK, chess.WHITE) for bb in pieces]
+    extras = [0] * (FEATURES - PLANES)
+    if board.move_stack:
+        last = board.peek()
+        if board.is_capture(last):
+            captured = board.piece_type_at(last.to_square)
+            if captured:
+                extras[CAPTURE - PLANES + captured - 1] = 1
+    for move in node.moves:
+        if board.is_capture(move):
+            captured = board.piece_type_at(move.to_square)
+            if captured:
+                extras[THREAT - PLANES + captured - 1] += 1
+    extras[MOBILITY - PLANES] = len(node.moves) if board.turn == chess.WHITE else -len(node.moves)
+    extras[CENTER - PLANES] = chess.popcount(board.occupied_co[board.turn] & CENTER_MASK)
+    return bitboards, extras
+
+
+def extract(samples: Iterable[Tuple[object, float]], limit: Optional[int] = None, log=None) -> FeatureBatch:
+    """FeatureBatch of (board, result) samples, converted to arrays a chunk at a time"""
+    parts = []
+    bitboards, extras, results = [], [], []
+    count = 0
+    started = time.time()
+
+    def flush():
+        if results:
+            parts.append(FeatureBatch(np.array(bitboards, dtype=np.uint64).reshape(-1, 2, 6),
+                                      np.array(extras, dtype=np.int16), np.array(results, dtype=np.float32)))
+            bitboards.clear()
+            extras.clear()
+            results.clear()
+            if log:
+                log(f"{count} positions, {count / (time.time() - started):.0f}/s")
+
+    for board, result in samples:
+        features = positionfeatures(board)
+        if features is None:
+            continue
+        bitboards.append(features[0])
+        extras.append(features[1])
+        results.append(result)
+        count += 1
+        if len(results) >= CHUNK:
+            flush()
+        if limit is not None and count >= limit:
+            break
+    flush()
+    if not parts:
+        return FeatureBatch(np.zeros((0, 2, 6), np.uint64), np.zeros((0, FEATURES - PLANES), np.int16),
+                            np.zeros(0, np.float32))
+    return FeatureBatch(*(np.concatenate(arrays) for arrays in zip(*parts)))
+
+
+def planes(bitboards: np.ndarray) -> np.ndarray:
+    """(n, 384) int8 piece planes from (n, 2, 6) bitboards"""
+    count = len(bitboards)
+    raw = np.ascontiguousarray(bitboards, dtype="<u8").view(np.uint8).reshape(count, 2, 6, 8)
+    bits = np.unpackbits(raw, axis=-1, bitorder="little").astype(np.int8).reshape(count, 2, 6, 8, 8)
+    # Black pieces are counted on the mirrored square, i.e. with the ranks flipped.
+    return (bits[:, 1] - bits[:, 0, :, ::-1]).reshape(count, PLANES)
+
+
+def featurematrix(batch: FeatureBatch, start: int = 0, stop: Optional[int] = None) -> np.ndarray:
+    """(n, FEATURES) float32 features of batch rows start:stop"""
+    return np.hstack([planes(batch.bitboards[start:stop]), batch.extras[start:stop]]).astype(np.float32)
+
+
+def evaluatebatch(batch: FeatureBatch, weights: np.ndarray) -> np.ndarray:
+    """Evaluator.evaluate of every position in batch, as one dot product"""
+    return featurematrix(batch).astype(np.float64) @ weights
+
+
+def evaluatorweights(evaluator: Evaluator) -> np.ndarray:
+    weights = np.zeros(FEATURES)
+    for piecetype in chess.PIECE_TYPES:
+        base = (piecetype - 1) * 64
+        weights[base:base + 64] = evaluator.squarevalues[chess.WHITE][piecetype]
+        weights[CAPTURE + piecetype - 1] = evaluator.capture.get(piecetype, 0)
+        weights[THREAT + piecetype - 1] = evaluator.threat.get(piecetype, 0)
+    weights[MOBILITY] = evaluator.mobility
+    weights[CENTER] = evaluator.centerbonus
+    return weights
+
+
+def weightsevaluator(weights: np.ndarray) -> Evaluator:
+    """Evaluator scoring like weights; each plane splits into a piece value and a piece-square table"""
+    values, pst = {}, {}
+    for piecetype in chess.PIECE_TYPES:
+        plane = weights[(piecetype - 1) * 64:piecetype * 64]
+        # Pawns never stand on the first or last rank, so those squares say nothing.
+        value = float(plane[8:56].mean() if piecetype == chess.PAWN else plane.mean())
+        values[piecetype] = value
+        pst[piecetype] = [float(bonus) - value for bonus in plane]
+    capture = {piecetype: float(weights[CAPTURE + piecetype - 1]) for piecetype in chess.PIECE_TYPES}
+    threat = {piecetype: float(weights[THREAT + piecetype - 1]) for piecetype in chess.PIECE_TYPES}
+    return Evaluator(values, pst, capture, threat, float(weights[MOBILITY]), float(weights[CENTER]))
+
+
+def sigmoid(scores: np.ndarray, scale: float) -> np.ndarray:
+    return 1 / (1 + np.exp(-scale * scores))
+
+
+def fitscale(scores: np.ndarray, results: np.ndarray) -> float:
+    """Scale K for which sigmoid(K * score) best predicts the results, by golden section search"""
+    def loss(scale):
+        return float(np.mean((results - sigmoid(scores, scale)) ** 2))
+
+    low, high = 1e-4, 1.0
+    ratio = (5 ** 0.5 - 1) / 2
+    for _ in range(60):
+        left, right = high - ratio * (high - low), low + ratio * (high - low)
+        if loss(left) < loss(right):
+            high = right
+        else:
+            low = left
+    return (low + high) / 2
+
+
+def tune(batch: FeatureBatch, evaluator: Optional[Evaluator] = None, epochs: int = 200, rate: float = 0.1,
+         pst: bool = False, scale: Optional[float] = None, log=print) -> Evaluator:
+    """Texel tuning: Adam on the mean squared error between results and sigmoid(K * eval).
+
+    Starts from evaluator's weights. Without pst each piece plane moves as a
+    whole, so only piece values change; with it every square is tuned.
+    """
+    weights = evaluatorweights(evaluator or Evaluator())
+    results = batch.results.astype(np.float64)
+    count = len(results)
+    if scale is None:
+        scale = fitscale(evaluatebatch(batch, weights), results)
+    log(f"{count} positions, scale {scale:.5f}")
+
+    moment = np.zeros(FEATURES)
+    velocity = np.zeros(FEATURES)
+    for epoch in range(1, epochs + 1):
+        gradient = np.zeros(FEATURES)
+        loss = 0.0
+        for start in range(0, count, CHUNK):
+            features = featurematrix(batch, start, start + CHUNK).astype(np.float64)
+            predicted = sigmoid(features @ weights, scale)
+            error = results[start:start + CHUNK] - predicted
+            loss += float(error @ error)
+            gradient += features.T @ (-2 * error * predicted * (1 - predicted) * scale)
+        gradient /= count
+        if not pst:
+            gradient[:PLANES] = np.repeat(gradient[:PLANES].reshape(6, 64).sum(axis=1), 64)
+
+        moment = 0.9 * moment + 0.1 * gradient
+        velocity = 0.999 * velocity + 0.001 * gradient ** 2
+        step = moment / (1 - 0.9 ** epoch) / (np.sqrt(velocity / (1 - 0.999 ** epoch)) + 1e-8)
+        weights -= rate * step
+        if epoch == 1 or epoch % 10 == 0 or epoch == epochs:
+            log(f"epoch {epoch}: loss {loss / count:.6f}")
+    return weightsevaluator(weights)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Texel-tune the Evaluator weights on labeled positions")
+    parser.add_argument("inputs", nargs="+", help="PGN files, EPD files with c9/result opcodes, or saved .npz features")
+    parser.add_argument("--out", required=True, help="weights JSON, for Evaluator.load")
+    parser.add_argument("--start", help="weights JSON to start from (default: the built-in weights)")
+    parser.add_argument("--save-features", help="also save the extracted features here (.npz)")
+    parser.add_argument("--limit", type=int, help="use at most this many positions")
+    parser.add_argument("--skip-plies", type=int, default=8, help="skip this many opening plies of PGN games")
+    parser.add_argument("--epochs", type=int, default=200)
+    parser.add_argument("--rate", type=float, default=0.1, help="Adam step size, in evaluation units")
+    parser.add_argument("--pst", action="store_true", help="tune piece-square tables, not just piece values")
+    args = parser.parse_args(argv)
+
+    saved = [path for path in args.inputs if path.endswith(".npz")]
+    other = [path for path in args.inputs if not path.endswith(".npz")]
+    batches = [FeatureBatch.load(path) for path in saved]
+    if other:
+        batches.append(extract(readlabeled(other, args.skip_plies, log=print), args.limit, log=print))
+    batch = FeatureBatch(*(np.concatenate(arrays) for arrays in zip(*batches)))
+    if args.save_features:
+        batch.save(args.save_features)
+
+    evaluator = Evaluator.load(args.start) if args.start else Evaluator()
+    tuned = tune(batch, evaluator, epochs=args.epochs, rate=args.rate, pst=args.pst)
+    tuned.save(args.out)
+    print(f"Wrote weights to {args.out}: values {tuned.values}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
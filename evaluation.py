@@ -0,0 +1,138 @@
+import chess
+import json
+from typing import Dict, List, Optional, Sequence
+
+from ttable import PieceChange
+
+PIECEVALUES = {
+    chess.PAWN: 10,
+    chess.KNIGHT: 30,
+    chess.BISHOP: 30,
+    chess.ROOK: 50,
+    chess.QUEEN: 90,
+    chess.KING: 0
+}
+
+CENTER_SQUARES = [chess.E4, chess.D4, chess.E5, chess.D5]
+CENTER_BONUS = 2
+
+# Share of a piece's value scored for having just captured it / for each legal capture of it.
+CAPTURE_BONUS = 0.5
+THREAT_BONUS = 0.1
+MOBILITY_BONUS = 0.1
+
+
+class Evaluator:
+    """Incrementally updated version of the Compooterchess.checkboard terms.
+
+    Material (plus optional piece-square tables, given from White's side and
+    mirrored for Black) and centre occupancy are kept up to date by push/pop,
+    so they cost nothing at a leaf. The capture and mobility terms still need
+    the leaf's legal moves, which the caller passes in so they are generated
+    once. With the default (empty) tables the score matches the old full-board
+    checkboard exactly.
+
+    capture and threat give the per piece type bonuses directly (by default
+    CAPTURE_BONUS and THREAT_BONUS of the piece value), so tuned weights can
+    be loaded with load().
+    """
+
+    def __init__(self, values: Optional[Dict[chess.PieceType, float]] = None,
+                 pst: Optional[Dict[chess.PieceType, Sequence[float]]] = None,
+                 capture: Optional[Dict[chess.PieceType, float]] = None,
+                 threat: Optional[Dict[chess.PieceType, float]] = None,
+                 mobility: float = MOBILITY_BONUS, center: float = CENTER_BONUS):
+        self.values = dict(PIECEVALUES if values is None else values)
+        self.pst = {piecetype: list(table) for piecetype, table in pst.items()} if pst else {}
+        self.capture = dict(capture) if capture is not None else {
+            piecetype: value * CAPTURE_BONUS for piecetype, value in self.values.items()}
+        self.threat = dict(threat) if threat is not None else {
+            piecetype: value * THREAT_BONUS for piecetype, value in self.values.items()}
+        self.mobility = mobility
+        self.centerbonus = center
+        # Signed value per (color, piece type, square) so an update is one lookup.
+        self.squarevalues = [[[0.0] * 64 for _ in range(7)] for _ in range(2)]
+        for piecetype, value in self.values.items():
+            table = pst.get(piecetype) if pst else None
+            for square in chess.SQUARES:
+                bonus = table[square] if table else 0
+                mirrored = table[chess.square_mirror(square)] if table else 0
+                self.squarevalues[chess.WHITE][piecetype][square] = value + bonus
+                self.squarevalues[chess.BLACK][piecetype][square] = -(value + mirrored)
+        self.board = None
+        self.reset(chess.Board())
+
+    @classmethod
+    def load(cls, path: str) -> "Evaluator":
+        """Evaluator with the weights save() (or evaltune.py) wrote to path"""
+        with open(path) as handle:
+            weights = json.load(handle)
+
+        def bytype(table):
+            return {int(piecetype): value for piecetype, value in table.items()} if table is not None else None
+        return cls(bytype(weights.get("values")), bytype(weights.get("pst")), bytype(weights.get("capture")),
+                   bytype(weights.get("threat")), weights.get("mobility", MOBILITY_BONUS),
+                   weights.get("center", CENTER_BONUS))
+
+    def weights(self) -> dict:
+        return {"values": self.values, "pst": self.pst, "capture": self.capture, "threat": self.threat,
+                "mobility": self.mobility, "center": self.centerbonus}
+
+    def save(self, path: str):
+        with open(path, "w") as handle:
+            json.dump(self.weights(), handle, indent=2)
+
+    def reset(self, board: chess.Board):
+        self.board = board
+        self.basestack = len(board.move_stack)
+        self.undo: List[tuple] = []
+        self.material = 0
+        self.center = [0, 0]
+        for square, piece in board.piece_map().items():
+            self.material += self.squarevalues[piece.color][piece.piece_type][square]
+        for square in CENTER_SQUARES:
+            piece = board.piece_at(square)
+            if piece:
+                self.center[piece.color] += 1
+
+    def tracks(self, board: chess.Board) -> bool:
+        return board is self.board and len(board.move_stack) == self.basestack + len(self.undo)
+
+    def push(self, removed: List[PieceChange], added: List[PieceChange]):
+        """Apply the piece changes of a move that is about to be pushed"""
+        self.undo.append((self.material, self.center[0], self.center[1]))
+        for square, piece in removed:
+            self.material -= self.squarevalues[piece.color][piece.piece_type][square]
+            if square in CENTER_SQUARES:
+                self.center[piece.color] -= 1
+        for square, piece in added:
+            self.material += self.squarevalues[piece.color][piece.piece_type][square]
+            if square in CENTER_SQUARES:
+                self.center[piece.color] += 1
+
+    def pop(self):
+        self.material, self.center[0], self.center[1] = self.undo.pop()
+
+    def evaluate(self, board: chess.Board, moves: Sequence[chess.Move]) -> float:
+        """Score of a non-terminal position from White's side, moves being its legal moves"""
+        score = self.material
+
+        if board.move_stack:
+            last = board.peek()
+            if board.is_capture(last):
+                captured_piece = board.piece_at(last.to_square)
+                if captured_piece:
+                    score += self.capture[captured_piece.piece_type]  # Bonus for capturing
+
+        threat = self.threat
+        for move in moves:
+            if board.is_capture(move):
+                captured_piece = board.piece_type_at(move.to_square)
+                if captured_piece:
+                    score += threat[captured_piece]  # Small bonus for possible captures
+
+        mobility = len(moves)
+        score += mobility * self.mobility if board.turn == chess.WHITE else -mobility * self.mobility
+
+        score += self.centerbonus * self.center[board.turn]
+        return score
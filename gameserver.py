@@ -0,0 +1,439 @@
+import argparse
+import asyncio
+import chess
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Deque, Dict, List, Optional
+
+from kewgame import BOOK_PATH, Compooterchess
+from openingbook import OpeningBook
+
+logger = logging.getLogger(__name__)
+
+# Searches get at least this long however late they leave the queue, so depth 1 always finishes.
+MIN_SEARCH_TIME = 0.05
+LATENCY_WINDOW = 1000
+
+# Per worker engine; its transposition table stays warm across all games.
+_engine = None
+
+
+def _initworker(options: dict):
+    global _engine
+    _engine = Compooterchess(**options)
+
+
+def _search(moves: List[str], timelimit: float) -> tuple:
+    """Best move for the game moves (UCI) from the start position: (uci, score, depth, nodes)"""
+    board = chess.Board()
+    for move in moves:
+        board.push_uci(move)
+    result = _engine.search(board, timelimit=timelimit)
+    return result.move.uci() if result.move else None, result.score, result.depth, result.nodes
+
+
+class Overloaded(Exception):
+    pass
+
+
+class SearchJob:
+    __slots__ = ("moves", "budget", "queued", "future")
+
+    def __init__(self, moves: List[str], budget: float, future: asyncio.Future):
+        self.moves = moves
+        self.budget = budget
+        self.queued = time.monotonic()
+        self.future = future
+
+
+class Latencies:
+    """The last LATENCY_WINDOW samples of one latency, with percentiles"""
+
+    def __init__(self):
+        self.samples: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+
+    def add(self, seconds: float):
+        self.samples.append(seconds)
+
+    def summary(self) -> dict:
+        if not self.samples:
+            return {}
+        ordered = sorted(self.samples)
+        pick = lambda share: round(ordered[min(len(ordered) - 1, int(share * len(ordered)))] * 1000, 1)
+        return {"p50ms": pick(0.5), "p95ms": pick(0.95), "p99ms": pick(0.99), "maxms": round(ordered[-1] * 1000, 1)}
+
+
+class Scheduler:
+    """Runs search jobs on a fixed process pool, taking turns between clients.
+
+    Every client has its own queue and the workers serve the clients with
+    queued jobs round-robin, so one client with many games cannot starve
+    the others. Time spent queued comes out of a job's time budget. When
+    more than maxqueue jobs are waiting, submit() raises Overloaded.
+    """
+
+    def __init__(self, workers: Optional[int] = None, maxqueue: int = 1000, engineoptions: Optional[dict] = None):
+        self.workers = workers or os.cpu_count() or 1
+        self.maxqueue = maxqueue
+        # Workers forked once clients are connected would hold copies of their
+        # sockets and keep them open after the server closes them, so spawn them.
+        self.pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"),
+                                        initializer=_initworker, initargs=(engineoptions or {},))
+        self.queues: Dict[object, Deque[SearchJob]] = {}
+        self.order: Deque[object] = deque()
+        self.waiting = 0
+        self.available: Optional[asyncio.Semaphore] = None
+        self.tasks: List[asyncio.Task] = []
+        self.busy = 0
+        self.maxdepth = 0
+        self.submitted = self.completed = self.rejected = self.expired = 0
+        self.nodes = 0
+        self.queuewait = Latencies()
+        self.searchtime = Latencies()
+        self.started = time.monotonic()
+
+    def start(self):
+        self.available = asyncio.Semaphore(0)
+        self.tasks = [asyncio.ensure_future(self.worker()) for _ in range(self.workers)]
+
+    async def close(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.pool.shutdown(cancel_futures=True)
+
+    async def submit(self, client: object, moves: List[str], budget: float) -> tuple:
+        if self.waiting >= self.maxqueue:
+            self.rejected += 1
+            raise Overloaded()
+        job = SearchJob(moves, budget, asyncio.get_running_loop().create_future())
+        queue = self.queues.get(client)
+        if queue is None:
+            queue = self.queues[client] = deque()
+            self.order.append(client)
+        queue.append(job)
+        self.waiting += 1
+        self.submitted += 1
+        self.maxdepth = max(self.maxdepth, self.waiting)
+        self.available.release()
+        return await job.future
+
+    def drop(self, client: object):
+        """Forget the queued jobs of a client that went away"""
+        queue = self.queues.pop(client, None)
+        if queue:
+            for job in queue:
+                job.future.cancel()
+            self.order.remove(client)
+            self.waiting -= len(queue)
+
+    def nextjob(self) -> Optional[SearchJob]:
+        # Jobs of dropped clients leave their permits behind, so there may be none.
+        if not self.order:
+            return None
+        client = self.order.popleft()
+        queue = self.queues[client]
+        job = queue.popleft()
+        if queue:
+            self.order.append(client)
+        else:
+            del self.queues[client]
+        self.waiting -= 1
+        return job
+
+    async def worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self.available.acquire()
+            job = self.nextjob()
+            if job is None or job.future.done():
+                continue
+            waited = time.monotonic() - job.queued
+            self.queuewait.add(waited)
+            if waited >= job.budget:
+                self.expired += 1
+            self.busy += 1
+            started = time.monotonic()
+            try:
+                result = await loop.run_in_executor(self.pool, _search, job.moves,
+                                                    max(MIN_SEARCH_TIME, job.budget - waited))
+            except Exception as error:
+                if not job.future.done():
+                    job.future.set_exception(error)
+                continue
+            finally:
+                self.busy -= 1
+            self.searchtime.add(time.monotonic() - started)
+            self.completed += 1
+            self.nodes += result[3]
+            if not job.future.done():
+                job.future.set_result(result)
+
+    def metrics(self) -> dict:
+        uptime = time.monotonic() - self.started
+        return {
+            "workers": self.workers, "busy": self.busy, "queued": self.waiting, "maxqueued": self.maxdepth,
+            "queuelimit": self.maxqueue, "clients": len(self.queues), "submitted": self.submitted,
+            "completed": self.completed, "rejected": self.rejected, "overbudget": self.expired,
+            "searches/s": round(self.completed / uptime, 2) if uptime else 0,
+            "nps": round(self.nodes / uptime) if uptime else 0,
+            "queuewait": self.queuewait.summary(), "search": self.searchtime.summary(),
+        }
+
+
+class GameSession:
+    __slots__ = ("id", "owner", "board", "human", "movetime", "thinking", "used")
+
+    def __init__(self, id: int, owner: object, human: bool, movetime: float):
+        self.id = id
+        # The connection that started the game; only it can see or play it.
+        self.owner = owner
+        self.board = chess.Board()
+        self.human = human
+        self.movetime = movetime
+        self.thinking = False
+        self.used = time.monotonic()
+
+
+class GameServer:
+    """Human-vs-engine games over a line protocol on TCP.
+
+    Commands, one per line:
+        new [white|black] [seconds]   start a game, replies "game <id>"
+        play <id> <move>              your move (UCI or SAN); the engine answers "<id> move <uci> <san>"
+        fen <id> / close <id>         show or end a game
+        metrics                       scheduler and server numbers as JSON
+        quit
+    Game replies start with the game id, so a client can run many games over
+    one connection. Games belong to the connection that started them and end
+    with it. A connection has at most maxinflight commands running; after
+    that the server stops reading from it until some finish.
+    """
+
+    def __init__(self, scheduler: Scheduler, movetime: float = 1.0, maxmovetime: float = 10.0,
+                 book: Optional[str] = BOOK_PATH, idle: float = 3600, maxinflight: int = 256):
+        self.scheduler = scheduler
+        self.movetime = movetime
+        self.maxmovetime = maxmovetime
+        self.book = OpeningBook(book) if book and os.path.exists(book) else None
+        self.idle = idle
+        self.maxinflight = maxinflight
+        self.sessions: Dict[int, GameSession] = {}
+        self.ids = itertools.count(1)
+        self.connections = 0
+        self.replylatency = Latencies()
+
+    async def serve(self, host: str, port: int):
+        self.scheduler.start()
+        server = await asyncio.start_server(self.handle, host, port, limit=4096)
+        janitor = asyncio.ensure_future(self.expire())
+        logger.info("Serving on %s:%s with %s workers", host, port, self.scheduler.workers)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            janitor.cancel()
+            await self.scheduler.close()
+
+    async def expire(self):
+        while True:
+            await asyncio.sleep(60)
+            cutoff = time.monotonic() - self.idle
+            for id in [id for id, session in self.sessions.items() if session.used < cutoff and not session.thinking]:
+                del self.sessions[id]
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        client = object()
+        inflight = asyncio.Semaphore(self.maxinflight)
+        tasks = set()
+
+        def send(line: str):
+            if not writer.is_closing():
+                writer.write((line + "\n").encode())
+
+        def spawn(coroutine):
+            task = asyncio.ensure_future(coroutine)
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+        async def run(words: List[str]):
+            try:
+                await self.play(client, words, send)
+            finally:
+                inflight.release()
+
+        try:
+            while True:
+                await inflight.acquire()
+                line = await reader.readline()
+                if not line:
+                    break
+                words = line.decode(errors="replace").split()
+                if not words:
+                    inflight.release()
+                    continue
+                if words[0] == "play":
+                    spawn(run(words))
+                else:
+                    inflight.release()
+                    if not self.command(client, words, send, spawn):
+                        break
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.scheduler.drop(client)
+            for task in tasks:
+                task.cancel()
+            for id in [id for id, session in self.sessions.items() if session.owner is client]:
+                del self.sessions[id]
+            self.connections -= 1
+            writer.close()
+
+    def command(self, client: object, words: List[str], send, spawn) -> bool:
+        """Everything but play, answered at once; returns False on quit"""
+        name, args = words[0], words[1:]
+        if name == "new":
+            human = not (args and args[0] == "black")
+            movetime = self.movetime
+            if len(args) > 1:
+                try:
+                    movetime = min(self.maxmovetime, max(MIN_SEARCH_TIME, float(args[1])))
+                except ValueError:
+                    pass
+            session = GameSession(next(self.ids), client, human, movetime)
+            self.sessions[session.id] = session
+            send(f"game {session.id} {'white' if human else 'black'} {movetime:g}")
+            if not human:
+                spawn(self.reply(client, session, send))
+        elif name == "metrics":
+            metrics = dict(self.scheduler.metrics(), sessions=len(self.sessions), connections=self.connections,
+                           reply=self.replylatency.summary())
+            send("metrics " + json.dumps(metrics))
+        elif name in ("fen", "close"):
+            session = self.session(client, args, send)
+            if session is not None:
+                if name == "fen":
+                    send(f"{session.id} fen {session.board.fen()}")
+                else:
+                    del self.sessions[session.id]
+                    send(f"{session.id} closed")
+        elif name == "quit":
+            return False
+        else:
+            send(f"error unknown command {name}")
+        return True
+
+    def session(self, client: object, args: List[str], send) -> Optional[GameSession]:
+        try:
+            session = self.sessions.get(int(args[0]))
+        except (IndexError, ValueError):
+            session = None
+        if session is not None and session.owner is not client:
+            # Other connections' games are not there as far as this one can tell.
+            session = None
+        if session is None:
+            send(f"error no such game {args[0] if args else ''}".rstrip())
+        else:
+            session.used = time.monotonic()
+        return session
+
+    async def play(self, client: object, words: List[str], send):
+        session = self.session(client, words[1:2], send)
+        if session is None:
+            return
+        board = session.board
+        if session.thinking or board.turn != session.human:
+            send(f"{session.id} error not your turn")
+            return
+        if board.is_game_over():
+            send(f"{session.id} gameover {board.result()}")
+            return
+        move = None
+        if len(words) > 2:
+            try:
+                move = board.parse_uci(words[2])
+            except ValueError:
+                try:
+                    move = board.parse_san(words[2])
+                except ValueError:
+                    pass
+        # Both parsers accept the null move "0000"/"--", so legality is still checked.
+        if move is None or not board.is_legal(move):
+            send(f"{session.id} error illegal move")
+            return
+        board.push(move)
+        await self.reply(client, session, send)
+
+    def takeback(self, session: GameSession):
+        """Undo the human move the engine could not answer; a game the engine should have opened is dropped"""
+        if session.board.move_stack:
+            session.board.pop()
+        else:
+            self.sessions.pop(session.id, None)
+
+    async def reply(self, client: object, session: GameSession, send):
+        """Let the engine move in session and send the move (and the result if that ends the game)"""
+        board = session.board
+        if board.is_game_over():
+            send(f"{session.id} gameover {board.result()}")
+            return
+        started = time.monotonic()
+        session.thinking = True
+        try:
+            move = self.book.find(board) if self.book else None
+            info = "book"
+            if move is None:
+                try:
+                    uci, score, depth, nodes = await self.scheduler.submit(
+                        client, [move.uci() for move in board.move_stack], session.movetime)
+                except Overloaded:
+                    send(f"{session.id} error busy")
+                    self.takeback(session)
+                    return
+                except asyncio.CancelledError:
+                    self.takeback(session)
+                    raise
+                move = chess.Move.from_uci(uci)
+                info = f"depth {depth} nodes {nodes}"
+            send(f"{session.id} move {move.uci()} {board.san(move)} {info}")
+            board.push(move)
+            self.replylatency.add(time.monotonic() - started)
+            if board.is_game_over():
+                send(f"{session.id} gameover {board.result()}")
+        finally:
+            session.thinking = False
+            session.used = time.monotonic()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Line protocol game server with a shared engine process pool")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, help="search processes (default: all cores)")
+    parser.add_argument("--maxqueue", type=int, default=1000, help="queued searches before new ones are refused")
+    parser.add_argument("--movetime", type=float, default=1.0, help="default seconds per engine move")
+    parser.add_argument("--maxmovetime", type=float, default=10.0, help="most seconds a game may ask for")
+    parser.add_argument("--idle", type=float, default=3600, help="drop games untouched for this many seconds")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    scheduler = Scheduler(args.workers, args.maxqueue)
+    server = GameServer(scheduler, args.movetime, args.maxmovetime, idle=args.idle)
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
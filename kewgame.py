@@ -1,105 +1,567 @@
 import chess
+import hashlib
+import json
+import logging
+import os
+import sys
+import threading
 import time
 import math
-from typing import Optional
+from typing import Callable, Optional
+from evaluation import Evaluator
+from moveorder import MoveOrderer
+from nodecontext import NodeContext
+from openingbook import OpeningBook
+from position import Position
+from searchcache import SearchCache
+from searchstats import SearchResult
+from ttable import EXACT, LOWER, UPPER, TranspositionTable, Zobrist, piecechanges
+
+logger = logging.getLogger(__name__)
+
+# Polyglot opening book used by wholeechess when the file exists
+BOOK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "book.bin")
+
+# Selective search settings
+NULLWINDOW = 0.01
+NULLMOVE_MIN_DEPTH = 3
+NULLMOVE_REDUCTION = 2
+LMR_MOVES = 3
+QUIESCENCE_PLIES = 8
+
+# Node budget for finishing a mate line the transposition table lost track of
+MATE_SEARCH_NODES = 20000
+
+class SearchAborted(Exception):
+    pass
+
+class TimeControl:
+    """Clock for the engine side: seconds left plus increment per move"""
+
+    def __init__(self, clock: float, increment: float = 0, movestogo: Optional[int] = None, overhead: float = 0.05):
+        self.clock = clock
+        self.increment = increment
+        self.movestogo = movestogo
+        self.overhead = overhead
+
+    def budget(self, board: chess.Board) -> float:
+        movesleft = self.movestogo or 30
+        budget = self.clock / movesleft + self.increment * 0.8
+        return max(0.01, min(budget, self.clock * 0.5) - self.overhead)
+
+    def spend(self, elapsed: float):
+        self.clock = max(0.0, self.clock - elapsed) + self.increment
+        if self.movestogo:
+            self.movestogo = max(1, self.movestogo - 1)
 
 class Compooterchess:
-    def __init__(self, thinkinlevel: int = 3):
+    def __init__(self, thinkinlevel: int = 3, hashmb: float = 16, maxdepth: int = 64,
+                 orderer: Optional[MoveOrderer] = None, evaluator: Optional[Evaluator] = None,
+                 pvs: bool = False, nullmove: bool = False, lmr: bool = False, quiescence: bool = False,
+                 cache: Optional[SearchCache] = None, profile: bool = False,
+                 info: Optional[Callable[[SearchResult], None]] = None, fastboard: bool = True):
         self.thinkinlevel = thinkinlevel
+        # Search on a Position copy of the board rather than the chess.Board itself.
+        self.fastboard = fastboard
+        self.cache = cache
+        # profile times move generation, ordering and evaluation; info is called
+        # with a SearchResult after every completed iteration.
+        self.profile = profile
+        self.info = info
+        self.maxdepth = maxdepth
+        # Selective search, each part can be switched on separately for benchmarking.
+        self.pvs = pvs
+        self.nullmove = nullmove
+        self.lmr = lmr
+        self.quiescence = quiescence
+        self.zobrist = Zobrist()
+        self.table = TranspositionTable(hashmb)
+        self.orderer = orderer if orderer is not None else MoveOrderer()
+        self.evaluator = evaluator if evaluator is not None else Evaluator()
+        self.nodes = 0
+        self.piecekeys = []
+        self.keyhistory = []
+        self.deadline = None
+        self.nodelimit = None
+        self.nextcheck = 0
+        self.stopped = False
+        self.sharedstop = None
+        self.depthreached = 0
+        self.depthtimes = []
+        self.depthlimit = 0
+        self.lastscore = 0.0
+        self.lastmateply = None
+        # A ponderhit that arrives before the search has set up its limits is
+        # kept in pendinghit and applied once it has.
+        self.ponderlock = threading.Lock()
+        self.searching = False
+        self.pendinghit = None
+        self.resetstats()
+        self.lastresult = None
 
-    def bestMoveornot(self, board: chess.Board) -> chess.Move:
-        bestmove = None
-        bestval = -math.inf
-        alpha = -math.inf
-        beta = math.inf
+    def resetstats(self):
+        self.leaves = 0
+        self.movegentime = 0.0
+        self.ordertime = 0.0
+        self.evaltime = 0.0
+        self.depthnodes = []
+        self.started = time.time()
+        self.tthits = self.table.hits
+        self.ttprobes = self.table.probes
+
+    def makeresult(self, move: Optional[chess.Move], fromcache: bool = False) -> SearchResult:
+        done = self.depthnodes
+        ebf = 0.0
+        if len(done) >= 2:
+            previous = done[-2] - (done[-3] if len(done) >= 3 else 0)
+            ebf = (done[-1] - done[-2]) / previous if previous else 0.0
+        return SearchResult(move, self.lastscore, self.depthreached, self.nodes, self.leaves,
+                            time.time() - self.started, self.orderer.cutoffs, self.orderer.firstcutoffs,
+                            self.table.hits - self.tthits, self.table.probes - self.ttprobes, ebf,
+                            self.movegentime, self.ordertime, self.evaltime, list(self.depthtimes), fromcache,
+                            self.lastmateply if abs(self.lastscore) == math.inf and not fromcache else None)
+
+    def search(self, board: chess.Board, **limits) -> SearchResult:
+        """bestMoveornot, but returning the move together with the search statistics"""
+        self.bestMoveornot(board, **limits)
+        return self.lastresult
+
+    def newgame(self):
+        self.table.clear()
+        self.orderer.clear()
+
+    def stop(self):
+        self.stopped = True
+
+    def ponderhit(self, timelimit: Optional[float] = None):
+        """Turn a running infinite (ponder) search into a normal one.
+
+        With a time limit the search gets that much more time, otherwise it
+        stops as soon as thinkinlevel is done. Called before the search has
+        started, it takes effect as soon as the search does.
+        """
+        with self.ponderlock:
+            if self.searching:
+                self.applyhit(timelimit)
+            else:
+                self.pendinghit = (timelimit,)
+
+    def applyhit(self, timelimit: Optional[float]):
+        if timelimit is not None:
+            self.deadline = time.time() + timelimit
+        else:
+            self.depthlimit = self.thinkinlevel
+            if self.depthreached >= self.thinkinlevel:
+                self.stopped = True
+
+    def configkey(self) -> int:
+        """64 bit fingerprint of the evaluator weights and search switches.
+
+        Mixed into the search cache keys, so engines configured differently
+        can share one cache file without reading each other's results.
+        """
+        config = {"weights": self.evaluator.weights(), "pvs": self.pvs, "nullmove": self.nullmove,
+                  "lmr": self.lmr, "quiescence": self.quiescence,
+                  "selective": [NULLWINDOW, NULLMOVE_MIN_DEPTH, NULLMOVE_REDUCTION, LMR_MOVES, QUIESCENCE_PLIES]}
+        digest = hashlib.sha256(json.dumps(config, sort_keys=True).encode()).digest()
+        return int.from_bytes(digest[:8], "little")
 
-        for move in board.legal_moves:
+    def expectedmove(self, board: chess.Board) -> Optional[chess.Move]:
+        """Best move for board remembered from the last search, if any (the move to ponder on)"""
+        entry = self.table.probe(self.zobrist(board))
+        if entry is not None and entry.move is not None and board.is_legal(entry.move):
+            return entry.move
+        return None
+
+    def mateply(self, board: chess.Board, move: chess.Move, winner: chess.Color) -> Optional[int]:
+        """Plies from board to checkmate by winner, playing move and then the table's best moves.
+
+        Where the table has no move (quiescence nodes, overwritten slots) the
+        rest is solved with a small exhaustive mate search. None if the mate
+        could not be followed to the end.
+        """
+        line = board.copy(stack=False)
+        line.push(move)
+        for plies in range(1, self.maxdepth + QUIESCENCE_PLIES + 1):
+            node = NodeContext(line, False)
+            if node.terminal:
+                return plies if node.check and not node.moves else None
+            entry = self.table.probe(self.zobrist(line))
+            if entry is None or entry.move not in node.moves:
+                budget = [MATE_SEARCH_NODES]
+                for rest in range(1, QUIESCENCE_PLIES + 1):
+                    if self.forcedmate(line, rest, winner, budget):
+                        return plies + rest
+                    if budget[0] <= 0:
+                        break
+                return None
+            line.push(entry.move)
+        return None
+
+    def forcedmate(self, board: chess.Board, plies: int, winner: chess.Color, budget: list) -> bool:
+        """Whether winner mates within plies whatever the other side does; budget[0] counts down the nodes"""
+        budget[0] -= 1
+        node = NodeContext(board, False)
+        if node.terminal:
+            return node.check and not node.moves and board.turn != winner
+        if plies <= 0 or budget[0] <= 0:
+            return False
+        for move in node.moves:
             board.push(move)
-            moveval = self.minimax(board, self.thinkinlevel - 1, alpha, beta, False)
+            mates = self.forcedmate(board, plies - 1, winner, budget)
             board.pop()
+            if mates != (board.turn != winner):
+                return mates
+        return board.turn != winner
 
-            if moveval > bestval or bestmove is None:
-                bestval = moveval
-                bestmove = move
+    def bestMoveornot(self, board: chess.Board, timelimit: Optional[float] = None, nodelimit: Optional[int] = None,
+                      timecontrol: Optional[TimeControl] = None, infinite: bool = False,
+                      depthlimit: Optional[int] = None) -> chess.Move:
+        """Fixed depth search to thinkinlevel, or an anytime search when given a time/node budget.
 
-            alpha = max(alpha, bestval)
-            if beta <= alpha:
+        With a budget the search deepens 1, 2, 3, ... and returns the best move
+        of the deepest iteration that finished before the budget ran out. An
+        infinite search deepens until stop() or ponderhit() ends it. depthlimit
+        caps the iterations of any of these.
+        """
+        if timecontrol is not None and timelimit is None and not infinite:
+            timelimit = timecontrol.budget(board)
+        if self.fastboard and not isinstance(board, Position):
+            board = Position.from_board(board)
+        limited = timelimit is not None or nodelimit is not None or infinite
+        self.depthlimit = depthlimit or (self.maxdepth if limited else self.thinkinlevel)
+
+        self.resetstats()
+        self.nodes = 0
+        self.stopped = False
+        self.deadline = self.started + timelimit if timelimit is not None else None
+        self.nodelimit = nodelimit
+        self.nextcheck = math.inf
+        self.depthreached = 0
+        self.depthtimes = []
+        self.lastmateply = None
+        self.table.newsearch()
+        self.orderer.newsearch()
+        self.setroot(board)
+        with self.ponderlock:
+            self.searching = True
+            hit, self.pendinghit = self.pendinghit, None
+            if hit is not None and infinite:
+                self.applyhit(*hit)
+        try:
+            return self.searchiterations(board, limited)
+        finally:
+            with self.ponderlock:
+                self.searching = False
+
+    def searchiterations(self, board: chess.Board, limited: bool) -> chess.Move:
+        """The iterative deepening loop of bestMoveornot, once the limits are set up"""
+        started = self.started
+        rootkey = self.positionkey(board)
+        cachekey = rootkey ^ self.configkey() if self.cache is not None else None
+        cached = self.cache.get(cachekey) if self.cache is not None else None
+        if cached is not None and not limited and cached.depth >= self.depthlimit and board.is_legal(cached.move):
+            self.depthreached, self.lastscore = cached.depth, cached.score
+            self.lastresult = self.makeresult(cached.move, fromcache=True)
+            return cached.move
+
+        entry = self.table.probe(rootkey)
+        hint = entry.move if entry else (cached.move if cached else None)
+        moves = self.ordermoves(board, board.legal_moves, hint, 0)
+        bestmove = None
+        depth = 0
+        while depth < self.depthlimit and not (self.stopped and depth):
+            depth += 1
+            try:
+                move, score = self.searchroot(board, depth, moves)
+            except SearchAborted:
+                while len(self.piecekeys) > 1:
+                    self.unmakemove(board)
+                break
+            bestmove, self.lastscore, self.depthreached = move, score, depth
+            if move is not None and abs(score) == math.inf:
+                self.lastmateply = self.mateply(board, move, chess.WHITE if score > 0 else chess.BLACK)
+            self.depthtimes.append(time.time() - started)
+            self.depthnodes.append(self.nodes)
+            if self.info is not None or logger.isEnabledFor(logging.DEBUG):
+                result = self.makeresult(move)
+                logger.debug("%s %s", move, result.summary())
+                if self.info is not None:
+                    self.info(result)
+            if move is None or abs(score) == math.inf:
                 break
+            # The first iteration always completes; after that limits, and stop(), are live
+            # for every search, so a fixed depth one can be stopped mid-iteration too.
+            self.nextcheck = self.nodes
+            moves.remove(move)
+            moves.insert(0, move)
 
+        if self.cache is not None and bestmove is not None:
+            self.cache.put(cachekey, self.depthreached, self.lastscore, bestmove)
+        self.lastresult = self.makeresult(bestmove)
         return bestmove
 
+    def searchroot(self, board: chess.Board, depth: int, moves) -> tuple:
+        maximizing = board.turn == chess.WHITE
+        bestmove = None
+        bestval = -math.inf if maximizing else math.inf
+        alpha = -math.inf
+        beta = math.inf
+
+        for move in moves:
+            self.makemove(board, move)
+            moveval = self.minimax(board, depth - 1, alpha, beta, not maximizing)
+            self.unmakemove(board)
+
+            if maximizing:
+                if moveval > bestval or bestmove is None:
+                    bestval = moveval
+                    bestmove = move
+                alpha = max(alpha, bestval)
+            else:
+                if moveval < bestval or bestmove is None:
+                    bestval = moveval
+                    bestmove = move
+                beta = min(beta, bestval)
+
+        return bestmove, bestval
+
+    def setroot(self, board: chess.Board):
+        """Point the incremental key/evaluation state at board as the search root"""
+        self.piecekeys = [self.zobrist.piecekey(board)]
+        self.keyhistory = self.gamekeys(board)
+        self.keyhistory.append(self.piecekeys[0] ^ self.zobrist.statekey(board))
+        self.evaluator.reset(board)
+
+    def checklimits(self):
+        self.nextcheck = self.nodes + 256
+        if self.nodelimit is not None:
+            self.nextcheck = min(self.nextcheck, self.nodelimit)
+            if self.nodes >= self.nodelimit:
+                raise SearchAborted()
+        if self.sharedstop is not None and self.sharedstop.value:
+            raise SearchAborted()
+        if self.stopped or (self.deadline is not None and time.time() >= self.deadline):
+            raise SearchAborted()
+
+    def makemove(self, board: chess.Board, move: chess.Move):
+        removed, added = piecechanges(board, move)
+        piecekey = self.piecekeys[-1] ^ self.zobrist.changedelta(removed, added)
+        self.evaluator.push(removed, added)
+        board.push(move)
+        self.piecekeys.append(piecekey)
+        self.keyhistory.append(piecekey ^ self.zobrist.statekey(board))
+
+    def unmakemove(self, board: chess.Board):
+        board.pop()
+        self.piecekeys.pop()
+        self.keyhistory.pop()
+        self.evaluator.pop()
+
+    def positionkey(self, board: chess.Board) -> int:
+        return self.keyhistory[-1]
+
+    def gamekeys(self, board: chess.Board) -> list:
+        """Keys of the game positions before board that can still repeat, oldest first"""
+        keys = []
+        replay = board.copy()
+        for _ in range(min(board.halfmove_clock, len(board.move_stack))):
+            replay.pop()
+            keys.append(self.zobrist(replay))
+        keys.reverse()
+        return keys
+
+    def repeated(self, board: chess.Board) -> bool:
+        """Fivefold repetition of the current position, from the key history"""
+        window = self.keyhistory[-(board.halfmove_clock + 1):]
+        return window[::-2].count(window[-1]) >= 5
+
     def minimax(self, board: chess.Board, depth: int, alpha: float, beta: float, checkbest: bool) -> float:
-        if depth == 0 or board.is_game_over():
-            return self.checkboard(board)
+        self.nodes += 1
+        if self.nodes >= self.nextcheck:
+            self.checklimits()
+        node = self.nodecontext(board)
+        if node.terminal:
+            return node.score
+        if depth <= 0:
+            if self.quiescence:
+                return self.quiesce(board, alpha, beta, checkbest, node=node)
+            return self.checkboard(board, node)
+
+        key = self.positionkey(board)
+        entry = self.table.probe(key)
+        hashmove = entry.move if entry is not None else None
+        if entry is not None and entry.depth >= depth:
+            if entry.bound == EXACT:
+                return entry.score
+            if entry.bound == LOWER:
+                alpha = max(alpha, entry.score)
+            elif entry.bound == UPPER:
+                beta = min(beta, entry.score)
+            if beta <= alpha:
+                return entry.score
+
+        # Null move: if passing still fails high, a real move will too. Skipped in
+        # check, right after another null move, and with only king and pawns left
+        # (zugzwang positions, where passing would be the best move).
+        if (self.nullmove and depth >= NULLMOVE_MIN_DEPTH and not node.check and board.move_stack and board.peek()
+                and board.occupied_co[board.turn] & ~(board.pawns | board.kings)):
+            if checkbest and beta != math.inf:
+                self.makemove(board, chess.Move.null())
+                value = self.minimax(board, depth - 1 - NULLMOVE_REDUCTION, beta - NULLWINDOW, beta, False)
+                self.unmakemove(board)
+                if value >= beta:
+                    return value
+            elif not checkbest and alpha != -math.inf:
+                self.makemove(board, chess.Move.null())
+                value = self.minimax(board, depth - 1 - NULLMOVE_REDUCTION, alpha, alpha + NULLWINDOW, True)
+                self.unmakemove(board)
+                if value <= alpha:
+                    return value
 
+        alphaorig, betaorig = alpha, beta
+        best = None
+        ply = len(self.piecekeys) - 1
+        moves = self.ordermoves(board, node.moves, hashmove, ply)
         if checkbest:
             worstmove = -math.inf
-            for move in board.legal_moves:
-                board.push(move)
-                eval = self.minimax(board, depth - 1, alpha, beta, False)
-                board.pop()
+            for index, move in enumerate(moves):
+                eval = self.searchmove(board, move, depth - 1, alpha, beta, checkbest, index, node.check)
+                if eval > worstmove or best is None:
+                    best = move
                 worstmove = max(worstmove, eval)
                 alpha = max(alpha, eval)
                 if beta <= alpha:
+                    self.orderer.cutoff(board, move, depth, ply, index)
                     break
-            return worstmove
+            value = worstmove
         else:
             bestmove = math.inf
-            for move in board.legal_moves:
-                board.push(move)
-                eval = self.minimax(board, depth - 1, alpha, beta, True)
-                board.pop()
+            for index, move in enumerate(moves):
+                eval = self.searchmove(board, move, depth - 1, alpha, beta, checkbest, index, node.check)
+                if eval < bestmove or best is None:
+                    best = move
                 bestmove = min(bestmove, eval)
                 beta = min(beta, eval)
                 if beta <= alpha:
+                    self.orderer.cutoff(board, move, depth, ply, index)
                     break
-            return bestmove
-
-    def checkboard(self, board: chess.Board) -> float:
-        if board.is_checkmate():
-            return -math.inf if board.turn == chess.WHITE else math.inf
-        if board.is_stalemate() or board.is_insufficient_material() or board.is_seventyfive_moves() or board.is_fivefold_repetition():
-            return 0
-
-        scorepieces = {
-            chess.PAWN: 10,
-            chess.KNIGHT: 30,
-            chess.BISHOP: 30,
-            chess.ROOK: 50,
-            chess.QUEEN: 90,
-            chess.KING: 0
-        }
+            value = bestmove
+
+        if value <= alphaorig:
+            bound = UPPER
+        elif value >= betaorig:
+            bound = LOWER
+        else:
+            bound = EXACT
+        self.table.store(key, depth, value, bound, best)
+        return value
+
+    def searchmove(self, board: chess.Board, move: chess.Move, depth: int, alpha: float, beta: float,
+                   checkbest: bool, index: int, incheck: bool) -> float:
+        """Score of move at a node where checkbest says who moves, with PVS and LMR when enabled"""
+        reduction = 0
+        if (self.lmr and index >= LMR_MOVES and depth >= 2 and not incheck
+                and not move.promotion and not board.is_capture(move)):
+            reduction = 1
+        self.makemove(board, move)
+        try:
+            if reduction and board.is_check():
+                reduction = 0
+            bound = alpha if checkbest else beta
+            narrow = self.pvs and index > 0 and abs(bound) != math.inf
+            if not narrow and not reduction:
+                return self.minimax(board, depth, alpha, beta, not checkbest)
 
-        score = 0
-        
-        # Material score
-        for square in chess.SQUARES:
-            piece = board.piece_at(square)
-            if piece:
-                value = scorepieces[piece.piece_type]
-                score += value if piece.color == chess.WHITE else -value
-
-        if board.is_capture(board.peek()):
-            captured_piece = board.piece_at(board.peek().to_square)
-            if captured_piece:
-                score += scorepieces[captured_piece.piece_type] * 0.5  # Bonus for capturing
-
-        for move in board.legal_moves:
-            if board.is_capture(move):
-                captured_piece = board.piece_at(move.to_square)
-                if captured_piece:
-                    score += scorepieces[captured_piece.piece_type] * 0.1  # Small bonus for possible captures
-
-        mobility = len(list(board.legal_moves))
-        score += mobility * 0.1 if board.turn == chess.WHITE else -mobility * 0.1
-
-        center_squares = [chess.E4, chess.D4, chess.E5, chess.D5]
-        for square in center_squares:
-            piece = board.piece_at(square)
-            if piece and piece.color == (board.turn == chess.WHITE):
-                score += 2
+            # Try a null window and/or reduced depth first and only search the
+            # move properly if it looks like it could improve on the bound.
+            if narrow:
+                window = (alpha, alpha + NULLWINDOW) if checkbest else (beta - NULLWINDOW, beta)
+            else:
+                window = (alpha, beta)
+            value = self.minimax(board, depth - reduction, window[0], window[1], not checkbest)
+            if checkbest:
+                again = value > alpha and (reduction or value < beta)
+            else:
+                again = value < beta and (reduction or value > alpha)
+            if again:
+                value = self.minimax(board, depth, alpha, beta, not checkbest)
+            return value
+        finally:
+            self.unmakemove(board)
+
+    def quiesce(self, board: chess.Board, alpha: float, beta: float, checkbest: bool, qply: int = 0,
+                node: Optional[NodeContext] = None) -> float:
+        """Resolve captures (and check evasions) past the horizon before trusting checkboard"""
+        if node is None:
+            self.nodes += 1
+            if self.nodes >= self.nextcheck:
+                self.checklimits()
+            node = self.nodecontext(board)
+            if node.terminal:
+                return node.score
+        if qply >= QUIESCENCE_PLIES:
+            return self.checkboard(board, node)
+
+        if node.check:
+            value = -math.inf if checkbest else math.inf
+            moves = node.moves
+        else:
+            value = self.checkboard(board, node)
+            if (checkbest and value >= beta) or (not checkbest and value <= alpha):
+                return value
+            moves = [move for move in node.moves if move.promotion or board.is_capture(move)]
+        if checkbest:
+            alpha = max(alpha, value)
+        else:
+            beta = min(beta, value)
+
+        for move in self.ordermoves(board, moves, None, len(self.piecekeys) - 1):
+            self.makemove(board, move)
+            score = self.quiesce(board, alpha, beta, not checkbest, qply + 1)
+            self.unmakemove(board)
+            if checkbest:
+                value = max(value, score)
+                alpha = max(alpha, score)
+            else:
+                value = min(value, score)
+                beta = min(beta, score)
+            if beta <= alpha:
+                break
+        return value
+
+    def nodecontext(self, board: chess.Board) -> NodeContext:
+        if not self.profile:
+            return NodeContext(board, self.repeated(board))
+        start = time.perf_counter()
+        node = NodeContext(board, self.repeated(board))
+        self.movegentime += time.perf_counter() - start
+        return node
+
+    def ordermoves(self, board: chess.Board, moves, hashmove: Optional[chess.Move], ply: int) -> list:
+        if not self.profile:
+            return self.orderer.order(board, moves, hashmove, ply)
+        start = time.perf_counter()
+        moves = self.orderer.order(board, moves, hashmove, ply)
+        self.ordertime += time.perf_counter() - start
+        return moves
+
+    def checkboard(self, board: chess.Board, node: Optional[NodeContext] = None) -> float:
+        if node is None:
+            node = NodeContext(board, board.is_fivefold_repetition())
+        if node.terminal:
+            return node.score
 
+        self.leaves += 1
+        if not self.evaluator.tracks(board):
+            self.evaluator.reset(board)
+        if not self.profile:
+            return self.evaluator.evaluate(board, node.moves)
+        start = time.perf_counter()
+        score = self.evaluator.evaluate(board, node.moves)
+        self.evaltime += time.perf_counter() - start
         return score
+
     # def checkboard(self, board: chess.Board) -> float:
     #     if board.is_checkmate():
     #         return -math.inf if board.turn == chess.WHITE else math.inf
@@ -128,9 +590,15 @@ class Compooterchess:
     #     return score
 
 class wholeechess:
-    def __init__(self):
+    def __init__(self, timecontrol: Optional[TimeControl] = None, book: Optional[str] = BOOK_PATH,
+                 cache: Optional[str] = None):
         self.board = chess.Board()
-        self.ai = Compooterchess(thinkinlevel=3)
+        self.ai = Compooterchess(thinkinlevel=3, cache=SearchCache(cache) if cache else None)
+        self.timecontrol = timecontrol
+        self.book = OpeningBook(book) if book and os.path.exists(book) else None
+
+    def bookmove(self) -> Optional[chess.Move]:
+        return self.book.find(self.board) if self.book else None
 
     def showboard(self):
         print("  a b c d e f g h")
@@ -181,12 +649,21 @@ class wholeechess:
                     print("Yo you dreamin or wot. told you enter in this notation: e2e4, Nf3, O-O, etc")
                     continue
             else:
+                move = self.bookmove()
+                if move:
+                    print(f"the bleck compooter knows this one from the book: {self.board.san(move)}")
+                    self.board.push(move)
+                    continue
                 print("Wait compoooter is thinkin")
                 start_time = time.time()
-                move = self.ai.bestMoveornot(self.board)
+                move = self.ai.bestMoveornot(self.board, timecontrol=self.timecontrol)
                 end_time = time.time()
                 print(f"the bleck compooter has moved: {self.board.san(move)}")
                 print(f"Tiem taken for da move is: {end_time - start_time:.2f} seconds")
+                print(f"Compooter brain stats: {self.ai.lastresult.summary()}")
+                if self.timecontrol:
+                    self.timecontrol.spend(end_time - start_time)
+                    print(f"Compooter clock: {self.timecontrol.clock:.1f} seconds left")
                 self.board.push(move)
 
         self.showboard()
@@ -202,5 +679,9 @@ class wholeechess:
             print("Draw by fivefold repetition.")
 
 if __name__ == "__main__":
-    game = wholeechess()
+    # Optional clock for the engine: python kewgame.py <seconds> [increment]
+    timecontrol = None
+    if len(sys.argv) > 1:
+        timecontrol = TimeControl(float(sys.argv[1]), float(sys.argv[2]) if len(sys.argv) > 2 else 0)
+    game = wholeechess(timecontrol)
     game.play()
\ No newline at end of file
@@ -0,0 +1,87 @@
+import chess
+from typing import Iterable, List, Optional
+
+# Victim / attacker values for MVV-LVA, kings never get captured.
+ORDERVALUES = {
+    chess.PAWN: 1,
+    chess.KNIGHT: 3,
+    chess.BISHOP: 3,
+    chess.ROOK: 5,
+    chess.QUEEN: 9,
+    chess.KING: 10
+}
+
+HASHMOVE = 1000000
+CAPTURE = 100000
+PROMOTION = 90000
+KILLER = 80000
+
+
+class MoveOrderer:
+    """Ranks moves before alpha-beta searches them.
+
+    Order: hash/PV move, captures by MVV-LVA, promotions, the two killer
+    moves of the ply, then quiet moves by history score. It also counts
+    beta cutoffs and how many of them came from the first move tried,
+    which is the number to watch when changing the ordering.
+    """
+
+    def __init__(self, killers: bool = True, history: bool = True, maxply: int = 128):
+        self.usekillers = killers
+        self.usehistory = history
+        self.maxply = maxply
+        self.history = [0] * (2 * 64 * 64)
+        self.newsearch()
+
+    def newsearch(self):
+        self.killers: List[List[Optional[chess.Move]]] = [[None, None] for _ in range(self.maxply)]
+        self.cutoffs = 0
+        self.firstcutoffs = 0
+        # Keep what history learned on earlier moves, but let it fade.
+        self.history = [value // 2 for value in self.history]
+
+    def clear(self):
+        self.history = [0] * (2 * 64 * 64)
+        self.newsearch()
+
+    def score(self, board: chess.Board, move: chess.Move, hashmove: Optional[chess.Move], ply: int) -> int:
+        if move == hashmove:
+            return HASHMOVE
+        if board.is_capture(move):
+            victim = board.piece_type_at(move.to_square) or chess.PAWN
+            attacker = board.piece_type_at(move.from_square)
+            return CAPTURE + 10 * ORDERVALUES[victim] - ORDERVALUES[attacker]
+        if move.promotion:
+            return PROMOTION + ORDERVALUES[move.promotion]
+        if self.usekillers and ply < self.maxply:
+            killers = self.killers[ply]
+            if move == killers[0]:
+                return KILLER
+            if move == killers[1]:
+                return KILLER - 1
+        if self.usehistory:
+            return self.history[board.turn * 4096 + move.from_square * 64 + move.to_square]
+        return 0
+
+    def order(self, board: chess.Board, moves: Iterable[chess.Move], hashmove: Optional[chess.Move] = None,
+              ply: int = 0) -> List[chess.Move]:
+        return sorted(moves, key=lambda move: self.score(board, move, hashmove, ply), reverse=True)
+
+    def cutoff(self, board: chess.Board, move: chess.Move, depth: int, ply: int, index: int):
+        """Record a beta cutoff by move, the index-th move tried at this node"""
+        self.cutoffs += 1
+        if index == 0:
+            self.firstcutoffs += 1
+        if board.is_capture(move) or move.promotion:
+            return
+        if self.usekillers and ply < self.maxply:
+            killers = self.killers[ply]
+            if killers[0] != move:
+                killers[1] = killers[0]
+                killers[0] = move
+        if self.usehistory:
+            self.history[board.turn * 4096 + move.from_square * 64 + move.to_square] += depth * depth
+
+    def cutoffrate(self) -> float:
+        """Share of beta cutoffs produced by the first move searched"""
+        return self.firstcutoffs / self.cutoffs if self.cutoffs else 0.0
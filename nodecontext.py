@@ -0,0 +1,29 @@
+import chess
+import math
+from typing import List
+
+
+class NodeContext:
+    """Everything search and evaluation need to know about one node, from one move generation.
+
+    The legal moves are generated once and check, mate, stalemate and the
+    draw rules are worked out from that list. Repetition is decided by the
+    caller (from its Zobrist key history) and passed in.
+    """
+
+    __slots__ = ("moves", "check", "terminal", "score")
+
+    def __init__(self, board: chess.Board, repeated: bool):
+        self.moves: List[chess.Move] = list(board.legal_moves)
+        self.check = board.is_check()
+        self.terminal = True
+        if not self.moves:
+            if self.check:
+                self.score = -math.inf if board.turn == chess.WHITE else math.inf
+            else:
+                self.score = 0
+        elif repeated or board.halfmove_clock >= 150 or board.is_insufficient_material():
+            self.score = 0
+        else:
+            self.terminal = False
+            self.score = None
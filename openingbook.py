@@ -0,0 +1,144 @@
+import chess
+import chess.pgn
+import chess.polyglot
+import mmap
+import os
+import random
+import struct
+import sys
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Polyglot layout: big-endian key (u64), move (u16), weight (u16), learn (u32),
+# 16 bytes per entry, sorted by key.
+ENTRY = struct.Struct(">QHHI")
+
+PROMOTION_CODES = {chess.KNIGHT: 1, chess.BISHOP: 2, chess.ROOK: 3, chess.QUEEN: 4}
+
+
+def encodemove(board: chess.Board, move: chess.Move) -> int:
+    """Polyglot move bits; castling is stored as king takes own rook"""
+    to_square = move.to_square
+    if board.is_castling(move):
+        rank = chess.square_rank(move.from_square)
+        to_square = chess.square(7 if board.is_kingside_castling(move) else 0, rank)
+    promotion = PROMOTION_CODES.get(move.promotion, 0)
+    return (promotion << 12) | (move.from_square << 6) | to_square
+
+
+def decodemove(board: chess.Board, raw: int) -> chess.Move:
+    to_square = raw & 0x3f
+    from_square = (raw >> 6) & 0x3f
+    promotion = (raw >> 12) & 0x7
+    move = chess.Move(from_square, to_square, promotion + 1 if promotion else None)
+    # Bring "king takes rook" castling back to the e1g1 form python-chess expects.
+    if board.piece_type_at(from_square) == chess.KING and board.color_at(to_square) == board.turn:
+        if board.piece_type_at(to_square) == chess.ROOK:
+            king_to = chess.square(6 if to_square > from_square else 2, chess.square_rank(from_square))
+            move = chess.Move(from_square, king_to)
+    return move
+
+
+class OpeningBook:
+    """Read-only Polyglot book, memory mapped and searched by binary search"""
+
+    def __init__(self, path: str, randomize: bool = False):
+        self.path = path
+        self.randomize = randomize
+        self.file = open(path, "rb")
+        size = os.fstat(self.file.fileno()).st_size
+        self.count = size // ENTRY.size
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if self.count else b""
+
+    def close(self):
+        if self.count:
+            self.data.close()
+        self.file.close()
+
+    def __len__(self) -> int:
+        return self.count
+
+    def entries(self, key: int) -> List[Tuple[int, int]]:
+        """(raw move, weight) of every entry for key"""
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if ENTRY.unpack_from(self.data, middle * ENTRY.size)[0] < key:
+                low = middle + 1
+            else:
+                high = middle
+        found = []
+        while low < self.count:
+            entrykey, raw, weight, _ = ENTRY.unpack_from(self.data, low * ENTRY.size)
+            if entrykey != key:
+                break
+            found.append((raw, weight))
+            low += 1
+        return found
+
+    def find(self, board: chess.Board) -> Optional[chess.Move]:
+        """Book move for board, the heaviest one (or weighted random when randomize is set)"""
+        if not self.count:
+            return None
+        candidates = []
+        for raw, weight in self.entries(chess.polyglot.zobrist_hash(board)):
+            move = decodemove(board, raw)
+            if board.is_legal(move):
+                candidates.append((move, weight))
+        if not candidates:
+            return None
+        if self.randomize and sum(weight for _, weight in candidates):
+            return random.choices([move for move, _ in candidates], [weight for _, weight in candidates])[0]
+        return max(candidates, key=lambda candidate: candidate[1])[0]
+
+
+def readgames(paths: Iterable[str]) -> Iterable[chess.pgn.Game]:
+    for path in paths:
+        with open(path, encoding="utf-8", errors="replace") as handle:
+            while True:
+                game = chess.pgn.read_game(handle)
+                if game is None:
+                    break
+                yield game
+
+
+def buildbook(pgnpaths: Iterable[str], outpath: str, maxply: int = 20, mincount: int = 1) -> int:
+    """Write a Polyglot book from the first maxply moves of every game; returns the entry count.
+
+    Each move scores 2 for a win of the side that played it, 1 for a draw and
+    0 for a loss, as in Polyglot. Moves seen fewer than mincount times, and
+    moves that only ever lost, are left out.
+    """
+    scores: Dict[Tuple[int, int], int] = defaultdict(int)
+    counts: Dict[Tuple[int, int], int] = defaultdict(int)
+    for game in readgames(pgnpaths):
+        result = game.headers.get("Result", "*")
+        board = game.board()
+        for ply, move in enumerate(game.mainline_moves()):
+            if ply >= maxply:
+                break
+            entry = (chess.polyglot.zobrist_hash(board), encodemove(board, move))
+            counts[entry] += 1
+            if result == "1/2-1/2":
+                scores[entry] += 1
+            elif result == ("1-0" if board.turn == chess.WHITE else "0-1"):
+                scores[entry] += 2
+            board.push(move)
+
+    entries = sorted(entry for entry, count in counts.items() if count >= mincount and scores[entry])
+    top = max((scores[entry] for entry in entries), default=0)
+    scale = 65535 / top if top > 65535 else 1
+    with open(outpath, "wb") as handle:
+        for key, raw in entries:
+            # Scaling down must not round a scored move to weight 0.
+            weight = max(1, int(scores[(key, raw)] * scale))
+            handle.write(ENTRY.pack(key, raw, weight, 0))
+    return len(entries)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print("usage: python openingbook.py <book.bin> <games.pgn> [more.pgn ...]")
+        sys.exit(1)
+    written = buildbook(sys.argv[2:], sys.argv[1])
+    print(f"Wrote {written} book entries to {sys.argv[1]}")
@@ -0,0 +1,200 @@
+import chess
+import math
+import multiprocessing
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Optional
+
+from kewgame import Compooterchess, SearchAborted
+
+# Per worker process state, set up once by _initworker so every worker keeps
+# its own warm transposition table and history between moves.
+_engine = None
+_bound = None
+_lastsearch = None
+
+
+def _initworker(options: dict, bound, stop):
+    global _engine, _bound
+    _engine = Compooterchess(**options)
+    _engine.sharedstop = stop
+    _bound = bound
+
+
+def _searchmove(board: chess.Board, move: chess.Move, depth: int, deadline: Optional[float], live: bool,
+                searchid: int):
+    """Search one root move; returns ((score, exact, reply, mateply), counters), with None instead if stopped.
+
+    reply is the best answer to move in this worker's table, for pondering,
+    and mateply the plies to mate this worker's table found for a mate score.
+
+    counters are the nodes, leaves, cutoffs, first move cutoffs, TT hits and
+    TT probes of this search, for the parent to add to its own statistics.
+    """
+    global _lastsearch
+    engine = _engine
+    if searchid != _lastsearch:
+        _lastsearch = searchid
+        engine.table.newsearch()
+        engine.orderer.newsearch()
+    cutoffs, firstcutoffs = engine.orderer.cutoffs, engine.orderer.firstcutoffs
+    hits, probes = engine.table.hits, engine.table.probes
+    engine.nodes = 0
+    engine.leaves = 0
+    engine.stopped = False
+    engine.deadline = deadline
+    engine.nodelimit = None
+    engine.nextcheck = 0 if live else math.inf
+    engine.setroot(board)
+
+    maximizing = board.turn == chess.WHITE
+    # The shared bound is the best root score found so far, seen from the side to move.
+    bound = _bound.value
+    alpha, beta = (bound, math.inf) if maximizing else (-math.inf, -bound)
+    value = None
+    engine.makemove(board, move)
+    try:
+        value = engine.minimax(board, depth - 1, alpha, beta, not maximizing)
+    except SearchAborted:
+        pass
+    finally:
+        while len(engine.piecekeys) > 1:
+            engine.unmakemove(board)
+    counters = (engine.nodes, engine.leaves, engine.orderer.cutoffs - cutoffs,
+                engine.orderer.firstcutoffs - firstcutoffs, engine.table.hits - hits, engine.table.probes - probes)
+    if value is None:
+        return None, counters
+
+    board.push(move)
+    entry = engine.table.probe(engine.zobrist(board))
+    board.pop()
+    reply = entry.move if entry is not None else None
+    mateply = None
+    if abs(value) == math.inf:
+        mateply = engine.mateply(board, move, chess.WHITE if value > 0 else chess.BLACK)
+
+    mine = value if maximizing else -value
+    with _bound.get_lock():
+        if mine > _bound.value:
+            _bound.value = mine
+    return (value, mine > bound, reply, mateply), counters
+
+
+class ParallelCompooterchess(Compooterchess):
+    """Compooterchess that splits the root moves of each iteration over a process pool.
+
+    Workers share the best root score found so far through shared memory and
+    use it as their alpha bound, so later moves are refuted with a narrow
+    window. Each worker keeps its own transposition table across moves. With
+    workers=1 no pool is started and the search is the plain serial one, so
+    results are deterministic.
+    """
+
+    def __init__(self, thinkinlevel: int = 3, workers: Optional[int] = None, hashmb: float = 16,
+                 startmethod: Optional[str] = None, **kwargs):
+        super().__init__(thinkinlevel=thinkinlevel, hashmb=hashmb, **kwargs)
+        self.workers = workers or multiprocessing.cpu_count()
+        self.workeroptions = dict(kwargs, thinkinlevel=thinkinlevel, hashmb=hashmb)
+        # The disk cache is read and written by this process only, at the root,
+        # and info reports whole iterations, which only this process sees.
+        self.workeroptions.pop("cache", None)
+        self.workeroptions.pop("info", None)
+        # Pass "spawn" when other threads may hold locks the workers need, e.g. one blocked reading stdin.
+        self.context = multiprocessing.get_context(startmethod)
+        self.bound = self.context.Value("d", -math.inf)
+        self.stopflag = self.context.Value("b", False)
+        self.pool = None
+        self.searchid = 0
+        # (key of the position after the best root move, the worker's reply there)
+        self.pvreply = None
+        # (best root move, the plies to mate its worker found after it)
+        self.pvmate = None
+
+    def getpool(self) -> ProcessPoolExecutor:
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(self.workers, mp_context=self.context, initializer=_initworker,
+                                            initargs=(self.workeroptions, self.bound, self.stopflag))
+        return self.pool
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
+            self.pool = None
+
+    def newgame(self):
+        super().newgame()
+        # Worker tables are only reachable by restarting the workers.
+        self.close()
+
+    def expectedmove(self, board: chess.Board) -> Optional[chess.Move]:
+        move = super().expectedmove(board)
+        if move is None and self.pvreply is not None:
+            # With workers the search ran in their tables, so use the reply they sent back.
+            key, reply = self.pvreply
+            if reply is not None and key == self.zobrist(board) and board.is_legal(reply):
+                return reply
+        return move
+
+    def mateply(self, board: chess.Board, move: chess.Move, winner: chess.Color) -> Optional[int]:
+        if self.workers <= 1:
+            return super().mateply(board, move, winner)
+        return self.pvmate[1] if self.pvmate is not None and self.pvmate[0] == move else None
+
+    def addcounters(self, counters: tuple):
+        """Count a worker's nodes, cutoffs and TT probes as if this engine had searched them"""
+        nodes, leaves, cutoffs, firstcutoffs, hits, probes = counters
+        self.nodes += nodes
+        self.leaves += leaves
+        self.orderer.cutoffs += cutoffs
+        self.orderer.firstcutoffs += firstcutoffs
+        self.table.hits += hits
+        self.table.probes += probes
+
+    def searchroot(self, board: chess.Board, depth: int, moves) -> tuple:
+        if self.workers <= 1:
+            return super().searchroot(board, depth, moves)
+        if depth == 1:
+            self.searchid += 1
+
+        pool = self.getpool()
+        # Past the first iteration every search, fixed depth ones too, honours stop() and its limits.
+        live = self.nextcheck != math.inf
+        deadline = self.deadline if live else None
+        self.bound.value = -math.inf
+        self.stopflag.value = False
+        root = board.copy(stack=board.halfmove_clock)
+
+        futures = {pool.submit(_searchmove, root, move, depth, deadline, live, self.searchid): index
+                   for index, move in enumerate(moves)}
+        results = [None] * len(moves)
+        pending = set(futures)
+        aborted = False
+        while pending:
+            done, pending = wait(pending, timeout=0.02, return_when=FIRST_COMPLETED)
+            for future in done:
+                result, counters = future.result()
+                self.addcounters(counters)
+                results[futures[future]] = result
+                aborted = aborted or result is None
+            if live and not aborted:
+                # self.deadline rather than deadline: a ponderhit can set it mid-iteration.
+                aborted = (self.stopped or (self.deadline is not None and time.time() >= self.deadline)
+                           or (self.nodelimit is not None and self.nodes >= self.nodelimit))
+            if aborted:
+                self.stopflag.value = True
+        if aborted:
+            raise SearchAborted()
+
+        maximizing = board.turn == chess.WHITE
+        bestmove, bestval, bestrank, bestreply, bestmate = None, None, None, None, None
+        for move, (value, exact, reply, mateply) in zip(moves, results):
+            # Prefer the higher score, and on a tie the move whose score is exact
+            # rather than a fail-low bound against another worker's alpha.
+            rank = (value if maximizing else -value, exact)
+            if bestrank is None or rank > bestrank:
+                bestmove, bestval, bestrank, bestreply, bestmate = move, value, rank, reply, mateply
+        if bestmove is not None:
+            root.push(bestmove)
+            self.pvreply = (self.zobrist(root), bestreply)
+            self.pvmate = (bestmove, bestmate)
+        return bestmove, bestval
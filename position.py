@@ -0,0 +1,457 @@
+import chess
+from typing import Dict, List, Optional, Union
+
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = chess.PIECE_TYPES
+
+# python-chess already ships precomputed attack tables; sliders are looked up
+# by square and the occupancy of the relevant rank, file or diagonals.
+BB_SQUARES = chess.BB_SQUARES
+KNIGHT_ATTACKS = chess.BB_KNIGHT_ATTACKS
+KING_ATTACKS = chess.BB_KING_ATTACKS
+PAWN_ATTACKS = chess.BB_PAWN_ATTACKS
+DIAG_MASKS = chess.BB_DIAG_MASKS
+DIAG_ATTACKS = chess.BB_DIAG_ATTACKS
+FILE_MASKS = chess.BB_FILE_MASKS
+FILE_ATTACKS = chess.BB_FILE_ATTACKS
+RANK_MASKS = chess.BB_RANK_MASKS
+RANK_ATTACKS = chess.BB_RANK_ATTACKS
+RAYS = chess.BB_RAYS
+BETWEEN = [[chess.between(a, b) for b in chess.SQUARES] for a in chess.SQUARES]
+BB_ALL = chess.BB_ALL
+
+# Shared Move and Piece objects, so generating a move allocates nothing.
+MOVES = [[chess.Move(a, b) for b in chess.SQUARES] for a in chess.SQUARES]
+PROMOTIONS = (QUEEN, ROOK, BISHOP, KNIGHT)
+PIECES = [[None] + [chess.Piece(piecetype, color) for piecetype in chess.PIECE_TYPES]
+          for color in (chess.BLACK, chess.WHITE)]
+
+
+def rookattacks(square: int, occupied: int) -> int:
+    return RANK_ATTACKS[square][RANK_MASKS[square] & occupied] | FILE_ATTACKS[square][FILE_MASKS[square] & occupied]
+
+
+def bishopattacks(square: int, occupied: int) -> int:
+    return DIAG_ATTACKS[square][DIAG_MASKS[square] & occupied]
+
+
+class Position:
+    """Search-only board: bitboards plus a mailbox, with make/unmake on an undo stack.
+
+    It answers the part of the chess.Board interface that search, ordering,
+    evaluation and Zobrist hashing use (push/pop/peek, legal_moves, is_check,
+    is_capture, piece_at, occupied_co, pawns, ...), without python-chess's
+    per-push state snapshots. Legal moves come from pseudo-legal generation
+    checked lazily: with the pinned pieces and the check mask worked out once,
+    only king moves and en passant captures need testing one by one.
+
+    Build one with from_board() and get a chess.Board back with to_board().
+    Standard chess only, no Chess960 castling.
+    """
+
+    __slots__ = ("pieces", "occupied_co", "mailbox", "turn", "castling_rights", "ep_square", "halfmove_clock",
+                 "fullmove_number", "move_stack", "undo", "root")
+
+    def __init__(self, board: Optional[chess.Board] = None):
+        """The position of board, without its move stack"""
+        board = chess.Board() if board is None else board
+        self.pieces = [0, board.pawns, board.knights, board.bishops, board.rooks, board.queens, board.kings]
+        self.occupied_co = [board.occupied_co[chess.BLACK], board.occupied_co[chess.WHITE]]
+        self.mailbox = [board.piece_type_at(square) or 0 for square in chess.SQUARES]
+        self.turn = board.turn
+        self.castling_rights = board.clean_castling_rights()
+        self.ep_square = board.ep_square
+        self.halfmove_clock = board.halfmove_clock
+        self.fullmove_number = board.fullmove_number
+        self.move_stack: List[chess.Move] = []
+        # (castling rights, ep square, halfmove clock, moved piece, captured piece, capture square) per move.
+        self.undo: List[tuple] = []
+        self.root = board.copy(stack=False)
+
+    @classmethod
+    def from_board(cls, board: chess.Board) -> "Position":
+        """board including its move stack, so moves can be popped back to the game start"""
+        if board.chess960:
+            raise ValueError("Position only supports standard chess")
+        position = cls(board.root())
+        for move in board.move_stack:
+            position.push(move)
+        return position
+
+    def to_board(self) -> chess.Board:
+        board = self.root.copy()
+        for move in self.move_stack:
+            board.push(move)
+        return board
+
+    def copy(self, stack: Union[bool, int] = True) -> "Position":
+        if stack is not True:
+            return Position.from_board(self.to_board().copy(stack=stack))
+        position = Position.__new__(Position)
+        position.pieces = self.pieces[:]
+        position.occupied_co = self.occupied_co[:]
+        position.mailbox = self.mailbox[:]
+        position.turn = self.turn
+        position.castling_rights = self.castling_rights
+        position.ep_square = self.ep_square
+        position.halfmove_clock = self.halfmove_clock
+        position.fullmove_number = self.fullmove_number
+        position.move_stack = self.move_stack[:]
+        position.undo = self.undo[:]
+        position.root = self.root
+        return position
+
+    def fen(self) -> str:
+        return self.to_board().fen()
+
+    def __repr__(self) -> str:
+        return f"Position({self.fen()!r})"
+
+    @property
+    def pawns(self) -> int:
+        return self.pieces[PAWN]
+
+    @property
+    def knights(self) -> int:
+        return self.pieces[KNIGHT]
+
+    @property
+    def bishops(self) -> int:
+        return self.pieces[BISHOP]
+
+    @property
+    def rooks(self) -> int:
+        return self.pieces[ROOK]
+
+    @property
+    def queens(self) -> int:
+        return self.pieces[QUEEN]
+
+    @property
+    def kings(self) -> int:
+        return self.pieces[KING]
+
+    @property
+    def occupied(self) -> int:
+        return self.occupied_co[0] | self.occupied_co[1]
+
+    def piece_type_at(self, square: int) -> Optional[int]:
+        return self.mailbox[square] or None
+
+    def color_at(self, square: int) -> Optional[bool]:
+        if self.occupied_co[chess.WHITE] & BB_SQUARES[square]:
+            return chess.WHITE
+        if self.occupied_co[chess.BLACK] & BB_SQUARES[square]:
+            return chess.BLACK
+        return None
+
+    def piece_at(self, square: int) -> Optional[chess.Piece]:
+        piecetype = self.mailbox[square]
+        if not piecetype:
+            return None
+        return PIECES[bool(self.occupied_co[chess.WHITE] & BB_SQUARES[square])][piecetype]
+
+    def piece_map(self) -> Dict[int, chess.Piece]:
+        return {square: self.piece_at(square) for square in chess.SQUARES if self.mailbox[square]}
+
+    def has_kingside_castling_rights(self, color: bool) -> bool:
+        return bool(self.castling_rights & (chess.BB_H1 if color else chess.BB_H8))
+
+    def has_queenside_castling_rights(self, color: bool) -> bool:
+        return bool(self.castling_rights & (chess.BB_A1 if color else chess.BB_A8))
+
+    def peek(self) -> chess.Move:
+        return self.move_stack[-1]
+
+    def push(self, move: chess.Move):
+        turn = self.turn
+        ep_square = self.ep_square
+        castling_rights = self.castling_rights
+        halfmove_clock = self.halfmove_clock
+        self.move_stack.append(move)
+        self.ep_square = None
+        self.halfmove_clock = halfmove_clock + 1
+        if not turn:
+            self.fullmove_number += 1
+        self.turn = not turn
+        if not move:
+            self.undo.append((castling_rights, ep_square, halfmove_clock, 0, 0, 0))
+            return
+
+        pieces = self.pieces
+        mailbox = self.mailbox
+        occupied_co = self.occupied_co
+        from_square = move.from_square
+        to_square = move.to_square
+        frombb = BB_SQUARES[from_square]
+        tobb = BB_SQUARES[to_square]
+        piece = mailbox[from_square]
+        captured = mailbox[to_square]
+        capsquare = to_square
+
+        pieces[piece] ^= frombb
+        occupied_co[turn] ^= frombb
+        mailbox[from_square] = 0
+        if piece == PAWN:
+            self.halfmove_clock = 0
+            if to_square == ep_square and not captured and (to_square - from_square) & 1:
+                capsquare = to_square - 8 if turn else to_square + 8
+                captured = PAWN
+            elif to_square - from_square in (16, -16):
+                self.ep_square = (from_square + to_square) // 2
+        elif piece == KING:
+            self.castling_rights &= ~(chess.BB_RANK_1 if turn else chess.BB_RANK_8)
+            if to_square - from_square == 2:
+                self.moverook(turn, to_square + 1, to_square - 1)
+            elif from_square - to_square == 2:
+                self.moverook(turn, to_square - 2, to_square + 1)
+        if captured:
+            capbb = BB_SQUARES[capsquare]
+            pieces[captured] ^= capbb
+            occupied_co[not turn] ^= capbb
+            mailbox[capsquare] = 0
+            self.halfmove_clock = 0
+        placed = move.promotion or piece
+        pieces[placed] |= tobb
+        occupied_co[turn] |= tobb
+        mailbox[to_square] = placed
+        self.castling_rights &= ~(frombb | tobb)
+        self.undo.append((castling_rights, ep_square, halfmove_clock, piece, captured, capsquare))
+
+    def pop(self) -> chess.Move:
+        move = self.move_stack.pop()
+        self.castling_rights, self.ep_square, self.halfmove_clock, piece, captured, capsquare = self.undo.pop()
+        self.turn = turn = not self.turn
+        if not turn:
+            self.fullmove_number -= 1
+        if not move:
+            return move
+
+        pieces = self.pieces
+        mailbox = self.mailbox
+        occupied_co = self.occupied_co
+        from_square = move.from_square
+        to_square = move.to_square
+        frombb = BB_SQUARES[from_square]
+        tobb = BB_SQUARES[to_square]
+        placed = mailbox[to_square]
+        pieces[placed] ^= tobb
+        occupied_co[turn] ^= tobb
+        mailbox[to_square] = 0
+        pieces[piece] |= frombb
+        occupied_co[turn] |= frombb
+        mailbox[from_square] = piece
+        if captured:
+            capbb = BB_SQUARES[capsquare]
+            pieces[captured] |= capbb
+            occupied_co[not turn] |= capbb
+            mailbox[capsquare] = captured
+        if piece == KING:
+            if to_square - from_square == 2:
+                self.moverook(turn, to_square - 1, to_square + 1)
+            elif from_square - to_square == 2:
+                self.moverook(turn, to_square + 1, to_square - 2)
+        return move
+
+    def moverook(self, color: bool, from_square: int, to_square: int):
+        change = BB_SQUARES[from_square] | BB_SQUARES[to_square]
+        self.pieces[ROOK] ^= change
+        self.occupied_co[color] ^= change
+        self.mailbox[from_square] = 0
+        self.mailbox[to_square] = ROOK
+
+    def attackers(self, color: bool, square: int, occupied: int) -> int:
+        """Pieces of color attacking square, sliders seeing through everything not in occupied"""
+        pieces = self.pieces
+        queens = pieces[QUEEN]
+        attackers = ((KNIGHT_ATTACKS[square] & pieces[KNIGHT]) | (KING_ATTACKS[square] & pieces[KING])
+                     | (PAWN_ATTACKS[not color][square] & pieces[PAWN])
+                     | (rookattacks(square, occupied) & (pieces[ROOK] | queens))
+                     | (bishopattacks(square, occupied) & (pieces[BISHOP] | queens)))
+        return attackers & self.occupied_co[color]
+
+    def kingsquare(self, color: bool) -> int:
+        return (self.pieces[KING] & self.occupied_co[color]).bit_length() - 1
+
+    def is_check(self) -> bool:
+        turn = self.turn
+        return bool(self.attackers(not turn, self.kingsquare(turn), self.occupied_co[0] | self.occupied_co[1]))
+
+    def is_en_passant(self, move: chess.Move) -> bool:
+        return (self.ep_square == move.to_square and self.mailbox[move.from_square] == PAWN
+                and abs(move.to_square - move.from_square) in (7, 9) and not self.mailbox[move.to_square])
+
+    def is_capture(self, move: chess.Move) -> bool:
+        # Same definition as chess.Board.is_capture, which the evaluation also
+        # applies to the move just played.
+        touched = BB_SQUARES[move.from_square] ^ BB_SQUARES[move.to_square]
+        return bool(touched & self.occupied_co[not self.turn]) or self.is_en_passant(move)
+
+    def is_castling(self, move: chess.Move) -> bool:
+        if self.mailbox[move.from_square] == KING and self.occupied_co[self.turn] & BB_SQUARES[move.from_square]:
+            diff = chess.square_file(move.from_square) - chess.square_file(move.to_square)
+            return abs(diff) > 1 or bool(self.pieces[ROOK] & self.occupied_co[self.turn] & BB_SQUARES[move.to_square])
+        return False
+
+    def is_kingside_castling(self, move: chess.Move) -> bool:
+        return self.is_castling(move) and chess.square_file(move.to_square) > chess.square_file(move.from_square)
+
+    def is_legal(self, move: chess.Move) -> bool:
+        return move in self.generate_legal()
+
+    @property
+    def legal_moves(self) -> List[chess.Move]:
+        return self.generate_legal()
+
+    def generate_legal(self) -> List[chess.Move]:
+        turn = self.turn
+        pieces = self.pieces
+        mailbox = self.mailbox
+        mine = self.occupied_co[turn]
+        theirs = self.occupied_co[not turn]
+        occupied = mine | theirs
+        king = (pieces[KING] & mine).bit_length() - 1
+        kingbb = BB_SQUARES[king]
+        moves = []
+
+        checkers = self.attackers(not turn, king, occupied)
+        for to_square in self.squares(KING_ATTACKS[king] & ~mine):
+            if not self.attackers(not turn, to_square, occupied ^ kingbb):
+                moves.append(MOVES[king][to_square])
+        if checkers & (checkers - 1):
+            return moves
+        if checkers:
+            checker = checkers.bit_length() - 1
+            target = BETWEEN[king][checker] | checkers
+        else:
+            target = BB_ALL
+            self.castlingmoves(moves, king, occupied)
+
+        # Own pieces standing between the king and an enemy slider may only move along that line.
+        pinned = 0
+        queens = pieces[QUEEN]
+        snipers = ((RANK_ATTACKS[king][0] | FILE_ATTACKS[king][0]) & (pieces[ROOK] | queens)
+                   | DIAG_ATTACKS[king][0] & (pieces[BISHOP] | queens)) & theirs
+        for sniper in self.squares(snipers):
+            blockers = BETWEEN[king][sniper] & occupied
+            if blockers and not blockers & (blockers - 1):
+                pinned |= blockers & mine
+
+        for from_square in self.squares(mine & ~pieces[PAWN] & ~kingbb):
+            piece = mailbox[from_square]
+            if piece == KNIGHT:
+                attacks = KNIGHT_ATTACKS[from_square]
+            elif piece == BISHOP:
+                attacks = bishopattacks(from_square, occupied)
+            elif piece == ROOK:
+                attacks = rookattacks(from_square, occupied)
+            else:
+                attacks = rookattacks(from_square, occupied) | bishopattacks(from_square, occupied)
+            attacks &= target & ~mine
+            if pinned & BB_SQUARES[from_square]:
+                attacks &= RAYS[king][from_square]
+            row = MOVES[from_square]
+            for to_square in self.squares(attacks):
+                moves.append(row[to_square])
+
+        forward = 8 if turn else -8
+        lastrank = chess.BB_RANK_8 if turn else chess.BB_RANK_1
+        startrank = chess.BB_RANK_2 if turn else chess.BB_RANK_7
+        pawnattacks = PAWN_ATTACKS[turn]
+        ep_square = self.ep_square
+        for from_square in self.squares(pieces[PAWN] & mine):
+            targets = pawnattacks[from_square] & theirs
+            single = from_square + forward
+            if not occupied & BB_SQUARES[single]:
+                targets |= BB_SQUARES[single]
+                double = single + forward
+                if BB_SQUARES[from_square] & startrank and not occupied & BB_SQUARES[double]:
+                    targets |= BB_SQUARES[double]
+            targets &= target
+            if pinned & BB_SQUARES[from_square]:
+                targets &= RAYS[king][from_square]
+            for to_square in self.squares(targets):
+                if BB_SQUARES[to_square] & lastrank:
+                    for promotion in PROMOTIONS:
+                        moves.append(chess.Move(from_square, to_square, promotion))
+                else:
+                    moves.append(MOVES[from_square][to_square])
+            if ep_square is not None and pawnattacks[from_square] & BB_SQUARES[ep_square]:
+                # Rare enough to just play it and look, which also covers the
+                # pawn pair leaving a rank the king stands on.
+                move = MOVES[from_square][ep_square]
+                self.push(move)
+                safe = not self.attackers(not turn, king, self.occupied_co[0] | self.occupied_co[1])
+                self.pop()
+                if safe:
+                    moves.append(move)
+        return moves
+
+    def castlingmoves(self, moves: List[chess.Move], king: int, occupied: int):
+        rights = self.castling_rights & self.occupied_co[self.turn] & self.pieces[ROOK]
+        if not rights:
+            return
+        enemy = not self.turn
+        if rights & BB_SQUARES[king + 3] and not occupied & (BB_SQUARES[king + 1] | BB_SQUARES[king + 2]):
+            if not (self.attackers(enemy, king + 1, occupied) or self.attackers(enemy, king + 2, occupied)):
+                moves.append(MOVES[king][king + 2])
+        if rights & BB_SQUARES[king - 4] and not occupied & (BB_SQUARES[king - 1] | BB_SQUARES[king - 2]
+                                                             | BB_SQUARES[king - 3]):
+            if not (self.attackers(enemy, king - 1, occupied) or self.attackers(enemy, king - 2, occupied)):
+                moves.append(MOVES[king][king - 2])
+
+    @staticmethod
+    def squares(bb: int) -> List[int]:
+        found = []
+        while bb:
+            square = bb.bit_length() - 1
+            found.append(square)
+            bb ^= 1 << square
+        return found
+
+    def is_insufficient_material(self) -> bool:
+        return all(self.has_insufficient_material(color) for color in chess.COLORS)
+
+    def has_insufficient_material(self, color: bool) -> bool:
+        """chess.Board.has_insufficient_material on the bitboards here"""
+        pieces = self.pieces
+        own = self.occupied_co[color]
+        if own & (pieces[PAWN] | pieces[ROOK] | pieces[QUEEN]):
+            return False
+        if own & pieces[KNIGHT]:
+            return (chess.popcount(own) <= 2
+                    and not (self.occupied_co[not color] & ~pieces[KING] & ~pieces[QUEEN]))
+        if own & pieces[BISHOP]:
+            bishops = pieces[BISHOP]
+            same_color = (not bishops & chess.BB_DARK_SQUARES) or (not bishops & chess.BB_LIGHT_SQUARES)
+            return same_color and not pieces[PAWN] and not pieces[KNIGHT]
+        return True
+
+    def transpositionkey(self) -> tuple:
+        return (tuple(self.pieces), self.occupied_co[chess.WHITE], self.turn, self.castling_rights, self.ep_square)
+
+    def is_repetition(self, count: int = 3) -> bool:
+        key = self.transpositionkey()
+        replay = self.copy()
+        seen = 1
+        for _ in range(min(self.halfmove_clock, len(self.move_stack))):
+            replay.pop()
+            if replay.transpositionkey() == key:
+                seen += 1
+                if seen >= count:
+                    return True
+        return False
+
+    def is_fivefold_repetition(self) -> bool:
+        return self.is_repetition(5)
+
+
+def perft(position: Position, depth: int) -> int:
+    moves = position.generate_legal()
+    if depth == 1:
+        return len(moves)
+    nodes = 0
+    for move in moves:
+        position.push(move)
+        nodes += perft(position, depth - 1)
+        position.pop()
+    return nodes
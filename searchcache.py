@@ -0,0 +1,94 @@
+import chess
+import sqlite3
+import threading
+import time
+from typing import NamedTuple, Optional
+
+
+class CachedResult(NamedTuple):
+    depth: int
+    score: float
+    move: chess.Move
+
+
+class SearchCache:
+    """Search results kept on disk in SQLite, shared by every engine pointed at the same file.
+
+    Rows map a key (the engine passes the position's Zobrist key mixed with
+    its configuration fingerprint) to the depth, score and best move of
+    the deepest search seen for it. SQLite (in WAL mode) handles several
+    processes reading and writing at once. When there are more than
+    maxentries rows the least recently used ones are dropped, and rows not
+    used for maxage seconds are dropped too.
+    """
+
+    def __init__(self, path: str, maxentries: int = 1000000, maxage: Optional[float] = None):
+        self.path = path
+        self.maxentries = maxentries
+        self.maxage = maxage
+        self.local = threading.local()
+        self.writes = 0
+        self.hits = 0
+        self.misses = 0
+        connection = self.connection()
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "key INTEGER PRIMARY KEY, depth INTEGER, score REAL, move TEXT, used REAL)")
+        connection.execute("CREATE INDEX IF NOT EXISTS results_used ON results (used)")
+        self.evict()
+
+    def connection(self) -> sqlite3.Connection:
+        # sqlite3 connections may not cross threads, so each thread gets its own.
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self.local.connection = connection
+        return connection
+
+    @staticmethod
+    def dbkey(key: int) -> int:
+        """Zobrist keys are unsigned 64 bit, SQLite integers are signed"""
+        return key - (1 << 64) if key >= (1 << 63) else key
+
+    def get(self, key: int) -> Optional[CachedResult]:
+        connection = self.connection()
+        row = connection.execute("SELECT depth, score, move FROM results WHERE key = ?",
+                                 (self.dbkey(key),)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        connection.execute("UPDATE results SET used = ? WHERE key = ?", (time.time(), self.dbkey(key)))
+        return CachedResult(row[0], row[1], chess.Move.from_uci(row[2]))
+
+    def put(self, key: int, depth: int, score: float, move: chess.Move):
+        """Store a result unless a deeper one is already there"""
+        self.connection().execute(
+            "INSERT INTO results (key, depth, score, move, used) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET depth = excluded.depth, score = excluded.score, "
+            "move = excluded.move, used = excluded.used WHERE excluded.depth >= results.depth",
+            (self.dbkey(key), depth, score, move.uci(), time.time()))
+        self.writes += 1
+        if self.writes % 256 == 0:
+            self.evict()
+
+    def evict(self):
+        connection = self.connection()
+        if self.maxage is not None:
+            connection.execute("DELETE FROM results WHERE used < ?", (time.time() - self.maxage,))
+        count = connection.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        if count > self.maxentries:
+            connection.execute(
+                "DELETE FROM results WHERE key IN (SELECT key FROM results ORDER BY used LIMIT ?)",
+                (count - self.maxentries,))
+
+    def __len__(self) -> int:
+        return self.connection().execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def close(self):
+        connection = getattr(self.local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self.local.connection = None
@@ -0,0 +1,53 @@
+import chess
+from typing import List, NamedTuple, Optional
+
+
+class SearchResult(NamedTuple):
+    """What one Compooterchess search did, for the CLI, the GUI and info hooks.
+
+    The *time fields are only filled in when the engine runs with
+    profile=True, since timing every node costs a little. mateply is set
+    when the score is a mate: the plies to checkmate along the line the
+    search found, None if that line could not be followed to the end.
+    """
+    move: Optional[chess.Move]
+    score: float
+    depth: int
+    nodes: int
+    leaves: int
+    seconds: float
+    cutoffs: int
+    firstcutoffs: int
+    tthits: int
+    ttprobes: int
+    ebf: float
+    movegentime: float
+    ordertime: float
+    evaltime: float
+    depthtimes: List[float]
+    fromcache: bool = False
+    mateply: Optional[int] = None
+
+    @property
+    def nps(self) -> float:
+        return self.nodes / self.seconds if self.seconds else 0.0
+
+    @property
+    def cutoffrate(self) -> float:
+        """Share of beta cutoffs that came from the first move tried"""
+        return self.firstcutoffs / self.cutoffs if self.cutoffs else 0.0
+
+    @property
+    def hitrate(self) -> float:
+        return self.tthits / self.ttprobes if self.ttprobes else 0.0
+
+    def summary(self) -> str:
+        if self.fromcache:
+            return f"depth {self.depth} from cache, {self.seconds:.2f}s"
+        line = (f"depth {self.depth}, {self.nodes} nodes in {self.seconds:.2f}s ({self.nps:.0f} nps), "
+                f"{self.leaves} evals, cutoffs {self.cutoffs} ({self.cutoffrate:.0%} first move), "
+                f"tt hits {self.hitrate:.0%}, ebf {self.ebf:.1f}")
+        if self.movegentime or self.evaltime:
+            line += (f", movegen {self.movegentime:.2f}s, ordering {self.ordertime:.2f}s, "
+                     f"eval {self.evaltime:.2f}s")
+        return line
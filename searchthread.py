@@ -0,0 +1,62 @@
+import chess
+import threading
+import time
+from typing import Callable, Optional
+
+from kewgame import Compooterchess
+
+
+class SearchThread(threading.Thread):
+    """Runs one Compooterchess search off the caller's thread.
+
+    The search works on its own copy of the board, so the caller can keep
+    drawing or reading the real one. When it finishes callback(move, elapsed)
+    is called from the search thread. A ponder search runs without limits
+    and only reports after ponderhit() or stop(); elapsed then counts from
+    the ponderhit.
+    """
+
+    def __init__(self, engine: Compooterchess, board: chess.Board, callback: Callable[[Optional[chess.Move], float], None],
+                 ponder: bool = False, **limits):
+        super().__init__(daemon=True)
+        self.engine = engine
+        self.board = board.copy()
+        self.callback = callback
+        self.ponder = ponder
+        # ponder turns False on ponderhit, which may come before run() reads it.
+        self.infinite = ponder
+        self.limits = limits
+        self.hit = threading.Event()
+        # Orders ponderhit() against the end of the search, see run().
+        self.lock = threading.Lock()
+        self.searched = False
+        self.start_time = time.time()
+        if not ponder:
+            self.hit.set()
+
+    def run(self):
+        self.start_time = time.time()
+        move = self.engine.bestMoveornot(self.board, infinite=self.infinite, **self.limits)
+        with self.lock:
+            self.searched = True
+            # A ponderhit that came in as the search ended must not carry over to the next one.
+            self.engine.pendinghit = None
+        self.hit.wait()
+        self.callback(move, time.time() - self.start_time)
+
+    def ponderhit(self, timelimit: Optional[float] = None):
+        self.start_time = time.time()
+        self.ponder = False
+        with self.lock:
+            # Before the search has started the engine keeps the hit until it does.
+            if not self.searched:
+                self.engine.ponderhit(timelimit)
+        self.hit.set()
+
+    def stop(self):
+        """Stop the search and wait for it; the callback still gets the best move so far"""
+        self.hit.set()
+        while self.is_alive():
+            # Repeat in case the search had not started yet and reset the flag.
+            self.engine.stop()
+            self.join(0.05)
@@ -0,0 +1,298 @@
+import argparse
+import chess
+import chess.pgn
+import math
+import os
+import random
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from evaluation import Evaluator
+from kewgame import BOOK_PATH, Compooterchess, TimeControl
+from openingbook import OpeningBook
+
+# Games still going after this many plies are scored as draws.
+MAX_PLIES = 300
+
+# Per worker engines, one per side (A or B) and configuration, reused from game to game.
+_engines: Dict[tuple, Compooterchess] = {}
+
+
+class GameResult(NamedTuple):
+    """One finished game; score is from engine A's side (1, 0.5 or 0)"""
+    score: float
+    pgn: str
+    nodes: Tuple[int, int]
+    seconds: Tuple[float, float]
+    cpu: float
+
+
+def parseoptions(text: str) -> dict:
+    """Engine options from "pvs=true,nullmove=1,thinkinlevel=4" style text; weights=<json> loads an Evaluator"""
+    options = {}
+    for item in filter(None, text.split(",")):
+        name, _, value = item.partition("=")
+        value = value.strip()
+        if value.lower() in ("true", "yes", "on", ""):
+            options[name.strip()] = True
+        elif value.lower() in ("false", "no", "off"):
+            options[name.strip()] = False
+        else:
+            try:
+                options[name.strip()] = int(value)
+            except ValueError:
+                try:
+                    options[name.strip()] = float(value)
+                except ValueError:
+                    options[name.strip()] = value
+    return options
+
+
+def openings(randomplies: int, seed: int, book: Optional[str] = BOOK_PATH) -> Iterator[List[chess.Move]]:
+    """Endless stream of opening lines: weighted-random book moves, then random legal moves up to randomplies"""
+    rng = random.Random(seed)
+    opening = OpeningBook(book, randomize=True) if book and os.path.exists(book) else None
+    while True:
+        board = chess.Board()
+        while len(board.move_stack) < randomplies:
+            move = opening.find(board) if opening else None
+            moves = list(board.legal_moves)
+            board.push(move or rng.choice(moves))
+            if board.is_game_over():
+                break
+        if not board.is_game_over():
+            yield board.move_stack
+
+
+def engine(side: str, options: dict) -> Compooterchess:
+    """The worker's engine for side; A and B never share one, even with equal options"""
+    key = (side, tuple(sorted(options.items())))
+    if key not in _engines:
+        options = dict(options)
+        weights = options.pop("weights", None)
+        if weights:
+            options["evaluator"] = Evaluator.load(weights)
+        _engines[key] = Compooterchess(**options)
+    return _engines[key]
+
+
+def playgame(opening: List[chess.Move], white: dict, black: dict, awhite: bool, timelimit: Optional[float],
+             nodelimit: Optional[int], clock: Optional[Tuple[float, float]]) -> GameResult:
+    """Play one game from opening; white and black are engine options, awhite says which of them is A"""
+    cpustart = time.process_time()
+    engines = (engine("B" if awhite else "A", black), engine("A" if awhite else "B", white))
+    for side in engines:
+        side.newgame()
+    clocks = {color: TimeControl(*clock) for color in chess.COLORS} if clock else None
+    nodes = {chess.WHITE: 0, chess.BLACK: 0}
+    seconds = {chess.WHITE: 0.0, chess.BLACK: 0.0}
+    board = chess.Board()
+    for move in opening:
+        board.push(move)
+
+    termination = "normal"
+    result = None
+    while result is None:
+        if board.is_game_over(claim_draw=True):
+            result = board.result(claim_draw=True)
+            break
+        if len(board.move_stack) >= MAX_PLIES:
+            result, termination = "1/2-1/2", "adjudication"
+            break
+        side = engines[board.turn]
+        start = time.time()
+        move = side.bestMoveornot(board, timelimit=timelimit, nodelimit=nodelimit,
+                                  timecontrol=clocks[board.turn] if clocks else None)
+        elapsed = time.time() - start
+        nodes[board.turn] += side.nodes
+        seconds[board.turn] += elapsed
+        if clocks:
+            if elapsed > clocks[board.turn].clock:
+                result, termination = ("0-1" if board.turn == chess.WHITE else "1-0"), "time forfeit"
+                break
+            clocks[board.turn].spend(elapsed)
+        board.push(move)
+
+    game = chess.pgn.Game.from_board(board)
+    game.headers["Event"] = "selfplay"
+    game.headers["White"] = "A" if awhite else "B"
+    game.headers["Black"] = "B" if awhite else "A"
+    game.headers["Result"] = result
+    game.headers["Termination"] = termination
+    game.headers["PlyCount"] = str(len(board.move_stack))
+    score = {"1-0": 1.0, "0-1": 0.0}.get(result, 0.5)
+    a, b = (chess.WHITE, chess.BLACK) if awhite else (chess.BLACK, chess.WHITE)
+    return GameResult(score if awhite else 1 - score, str(game), (nodes[a], nodes[b]),
+                      (seconds[a], seconds[b]), time.process_time() - cpustart)
+
+
+def logistic(elo: float) -> float:
+    return 1 / (1 + 10 ** (-elo / 400))
+
+
+def elo(score: float) -> float:
+    score = min(max(score, 1e-6), 1 - 1e-6)
+    return -400 * math.log10(1 / score - 1)
+
+
+class MatchStats:
+    """Running totals of a match, seen from engine A"""
+
+    def __init__(self, elo0: float = 0, elo1: float = 5, alpha: float = 0.05, beta: float = 0.05):
+        self.wins = self.draws = self.losses = 0
+        self.nodes = [0, 0]
+        self.seconds = [0.0, 0.0]
+        self.cpu = 0.0
+        self.started = time.time()
+        self.elo0, self.elo1 = elo0, elo1
+        self.lower = math.log(beta / (1 - alpha))
+        self.upper = math.log((1 - beta) / alpha)
+
+    def add(self, result: GameResult):
+        if result.score == 1:
+            self.wins += 1
+        elif result.score == 0:
+            self.losses += 1
+        else:
+            self.draws += 1
+        for side in (0, 1):
+            self.nodes[side] += result.nodes[side]
+            self.seconds[side] += result.seconds[side]
+        self.cpu += result.cpu
+
+    @property
+    def games(self) -> int:
+        return self.wins + self.draws + self.losses
+
+    @property
+    def score(self) -> float:
+        return (self.wins + 0.5 * self.draws) / self.games if self.games else 0.5
+
+    def variance(self) -> float:
+        """Per game variance of the score"""
+        if not self.games:
+            return 0.0
+        score = self.score
+        return (self.wins * (1 - score) ** 2 + self.draws * (0.5 - score) ** 2
+                + self.losses * score ** 2) / self.games
+
+    def elo(self) -> Tuple[float, float]:
+        """Elo difference of A over B and the half width of its 95% interval"""
+        if not self.games:
+            return 0.0, math.inf
+        margin = 1.96 * math.sqrt(self.variance() / self.games)
+        low, high = elo(self.score - margin), elo(self.score + margin)
+        return elo(self.score), (high - low) / 2
+
+    def llr(self) -> float:
+        """Log likelihood ratio of elo1 against elo0, normal approximation of the trinomial"""
+        variance = self.variance()
+        if not variance:
+            return 0.0
+        score0, score1 = logistic(self.elo0), logistic(self.elo1)
+        return self.games * (score1 - score0) * (2 * self.score - score0 - score1) / (2 * variance)
+
+    def decision(self) -> Optional[str]:
+        llr = self.llr()
+        if llr >= self.upper:
+            return "H1"
+        if llr <= self.lower:
+            return "H0"
+        return None
+
+    def summary(self) -> str:
+        diff, margin = self.elo()
+        hours = (time.time() - self.started) / 3600
+        nps = [self.nodes[side] / self.seconds[side] if self.seconds[side] else 0 for side in (0, 1)]
+        return (f"games {self.games}: +{self.wins} ={self.draws} -{self.losses}, score {self.score:.1%}, "
+                f"elo {diff:+.1f} +/- {margin:.1f}, LLR {self.llr():.2f} [{self.lower:.2f}, {self.upper:.2f}], "
+                f"{self.games / hours if hours else 0:.0f} games/h "
+                f"({self.games / (self.cpu / 3600) if self.cpu else 0:.0f} per cpu-hour), "
+                f"nps A {nps[0]:.0f} B {nps[1]:.0f}")
+
+
+def match(a: dict, b: dict, games: int, workers: Optional[int] = None, timelimit: Optional[float] = None,
+          nodelimit: Optional[int] = None, clock: Optional[Tuple[float, float]] = None, randomplies: int = 8,
+          seed: int = 0, book: Optional[str] = BOOK_PATH, pgnpath: Optional[str] = None, sprt: bool = True,
+          stats: Optional[MatchStats] = None, log=print) -> MatchStats:
+    """Play up to games games of A against B, each opening twice with colours swapped.
+
+    Games are farmed out to a process pool, at most a few per worker queued
+    at once. With sprt the match stops as soon as the SPRT accepts either
+    hypothesis. Finished games are appended to pgnpath as they come in.
+    """
+    workers = workers or os.cpu_count() or 1
+    stats = stats or MatchStats()
+    lines = openings(randomplies, seed, book)
+    pending = set()
+    submitted = 0
+    opening = None
+    pgn = open(pgnpath, "a", encoding="utf-8") if pgnpath else None
+    try:
+        with ProcessPoolExecutor(workers) as pool:
+            while True:
+                while submitted < games and len(pending) < workers * 2:
+                    awhite = submitted % 2 == 0
+                    if awhite:
+                        opening = next(lines)
+                    white, black = (a, b) if awhite else (b, a)
+                    pending.add(pool.submit(playgame, opening, white, black, awhite, timelimit, nodelimit, clock))
+                    submitted += 1
+                if not pending:
+                    break
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    result = future.result()
+                    stats.add(result)
+                    if pgn:
+                        pgn.write(result.pgn + "\n\n")
+                        pgn.flush()
+                    if stats.games % 10 == 0:
+                        log(stats.summary())
+                if sprt and stats.decision():
+                    for future in pending:
+                        future.cancel()
+                    log(f"SPRT accepted {stats.decision()}")
+                    break
+    finally:
+        if pgn:
+            pgn.close()
+    return stats
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Self-play match between two Compooterchess configurations")
+    parser.add_argument("--a", default="", help="options of engine A, e.g. pvs=true,weights=tuned.json")
+    parser.add_argument("--b", default="", help="options of engine B")
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--workers", type=int, help="worker processes (default: all cores)")
+    parser.add_argument("--time", type=float, help="seconds per move")
+    parser.add_argument("--nodes", type=int, help="nodes per move")
+    parser.add_argument("--tc", help="clock per game as seconds[+increment], e.g. 10+0.1")
+    parser.add_argument("--random-plies", type=int, default=8, help="length of the randomized openings")
+    parser.add_argument("--book", default=BOOK_PATH, help="Polyglot book used for the openings, if it exists")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--pgn", help="append the games here")
+    parser.add_argument("--elo0", type=float, default=0)
+    parser.add_argument("--elo1", type=float, default=5)
+    parser.add_argument("--alpha", type=float, default=0.05)
+    parser.add_argument("--beta", type=float, default=0.05)
+    parser.add_argument("--no-sprt", action="store_true", help="play all games without early stopping")
+    args = parser.parse_args(argv)
+
+    clock = None
+    if args.tc:
+        base, _, increment = args.tc.partition("+")
+        clock = (float(base), float(increment or 0))
+    stats = MatchStats(args.elo0, args.elo1, args.alpha, args.beta)
+    match(parseoptions(args.a), parseoptions(args.b), args.games, workers=args.workers, timelimit=args.time,
+          nodelimit=args.nodes, clock=clock, randomplies=args.random_plies, seed=args.seed, book=args.book,
+          pgnpath=args.pgn, sprt=not args.no_sprt, stats=stats)
+    print(stats.summary())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,48 @@
+import json
+
+from batchanalysis import analyse, resumepoint
+
+POSITIONS = [
+    "rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq -",
+    "4k3/4R3/8/8/8/8/8/4K3 w - -",
+    "r1bqkbnr/pppp1ppp/2n5/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R w KQkq -",
+    "not an epd",
+    "8/8/8/4k3/8/8/4P3/4K3 w - -",
+    "8/5pk1/6p1/8/3R4/6P1/5PK1/r7 w - -",
+]
+
+
+def readids(path) -> list:
+    with open(path, encoding="utf-8") as handle:
+        return [json.loads(line)["id"] for line in handle]
+
+
+def test_resume_after_a_torn_last_line(tmp_path):
+    epd = tmp_path / "positions.epd"
+    epd.write_text("\n".join(POSITIONS) + "\n")
+    full = tmp_path / "full.jsonl"
+    assert analyse([str(epd)], str(full), workers=1, depth=1, log=lambda line: None) == len(POSITIONS)
+    expected = readids(full)
+    assert len(expected) == len(set(expected)) == len(POSITIONS)
+
+    # Interrupted after three results, the fourth half written.
+    lines = full.read_text(encoding="utf-8").splitlines(keepends=True)
+    partial = tmp_path / "partial.jsonl"
+    partial.write_text("".join(lines[:3]) + lines[3][:10], encoding="utf-8")
+    assert resumepoint(str(partial)) == 3
+    assert partial.read_text(encoding="utf-8") == "".join(lines[:3])
+
+    assert analyse([str(epd)], str(partial), workers=1, depth=1, log=lambda line: None) == len(POSITIONS) - 3
+    assert readids(partial) == expected
+    records = [json.loads(line) for line in partial.read_text(encoding="utf-8").splitlines()]
+    assert [bool(record.get("error")) for record in records] == [False, True, False, True, False, False]
+
+
+def test_resume_of_a_finished_run_adds_nothing(tmp_path):
+    epd = tmp_path / "positions.epd"
+    epd.write_text("\n".join(POSITIONS[:3]) + "\n")
+    out = tmp_path / "out.jsonl"
+    analyse([str(epd)], str(out), workers=1, depth=1, log=lambda line: None)
+    before = out.read_text(encoding="utf-8")
+    assert analyse([str(epd)], str(out), workers=1, depth=1, log=lambda line: None) == 0
+    assert out.read_text(encoding="utf-8") == before
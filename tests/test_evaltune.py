@@ -0,0 +1,19 @@
+from evaltune import extract, readlabeled
+
+LINES = [
+    'rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq - c9 "1-0";',
+    "not an epd",
+    '4k3/4R3/8/8/8/8/8/4K3 w - - c9 "1-0";',
+    '8/8/8/3kK3/8/8/8/8 w - - c9 "1/2-1/2";',
+    '8/8/8/4k3/8/8/4P3/4K3 w - - c9 "1/2-1/2";',
+]
+
+
+def test_bad_epd_lines_are_skipped_and_logged(tmp_path):
+    epd = tmp_path / "labeled.epd"
+    epd.write_text("\n".join(LINES) + "\n")
+    logged = []
+    assert [result for _, result in readlabeled([str(epd)], log=logged.append)] == [1.0, 0.5]
+    assert [f"labeled.epd:{lineno}: " in line for lineno, line in zip((2, 3, 4), logged)] == [True] * 3
+    assert len(logged) == 3
+    assert len(extract(readlabeled([str(epd)])).results) == 2
@@ -0,0 +1,143 @@
+import asyncio
+import chess
+import pytest
+from concurrent.futures import Executor, Future
+from typing import Tuple
+
+from gameserver import GameServer, Overloaded, Scheduler
+
+
+class FixedScheduler:
+    """Scheduler stand-in that answers every search with one move"""
+
+    def __init__(self, uci: str):
+        self.uci = uci
+
+    async def submit(self, client, moves, budget):
+        return self.uci, 0.0, 1, 1
+
+
+def playfrom(fen: str, move: str, answer: str) -> list:
+    """Lines sent back after the human plays move in fen, the engine answering with answer"""
+    server = GameServer(FixedScheduler(answer), book=None)
+    client = object()
+    sent = []
+    server.command(client, ["new", "white"], sent.append, None)
+    session = server.sessions[1]
+    session.board = chess.Board(fen)
+    asyncio.run(server.play(client, ["play", "1", move], sent.append))
+    return sent[1:]
+
+
+def test_play_takes_uci_and_san_promotions():
+    fen = "8/4P3/8/8/8/8/k6P/4K3 w - - 0 1"
+    for text in ("e7e8q", "e8=Q", "e8Q", "e8=N"):
+        sent = playfrom(fen, text, "a2b2")
+        assert sent and sent[0].startswith("1 move a2b2 "), (text, sent)
+
+
+def test_play_refuses_illegal_and_null_moves():
+    for text in ("e7e8", "e2e4", "0000", "--", "Qe8"):
+        assert playfrom("8/4P3/8/8/8/8/k6P/4K3 w - - 0 1", text, "a2b2") == ["1 error illegal move"], text
+
+
+class GateExecutor(Executor):
+    """Executor stand-in that runs nothing: it records each search and lets the test finish it"""
+
+    def __init__(self):
+        self.searches = []
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        self.searches.append((args[0], future))
+        return future
+
+    def finish(self):
+        """Answer every search still running, naming its first move as the best one"""
+        for moves, future in self.searches:
+            if not future.done():
+                future.set_result((moves[0], 0.0, 1, 1))
+
+
+def gatedscheduler(workers: int = 1, maxqueue: int = 1000) -> Tuple[Scheduler, GateExecutor]:
+    scheduler = Scheduler(workers, maxqueue)
+    scheduler.pool.shutdown()
+    scheduler.pool = GateExecutor()
+    return scheduler, scheduler.pool
+
+
+async def settle():
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+
+def test_scheduler_takes_turns_between_clients():
+    async def run():
+        scheduler, gate = gatedscheduler()
+        scheduler.start()
+        greedy, modest = object(), object()
+        # The one worker is busy while both clients queue up.
+        jobs = [asyncio.ensure_future(scheduler.submit(object(), ["busy"], 1.0))]
+        await settle()
+        jobs += [asyncio.ensure_future(scheduler.submit(greedy, [f"greedy{n}"], 1.0)) for n in range(5)]
+        jobs.append(asyncio.ensure_future(scheduler.submit(modest, ["modest"], 1.0)))
+        await settle()
+        while not all(job.done() for job in jobs):
+            await settle()
+            gate.finish()
+        await scheduler.close()
+        return [moves[0] for moves, _ in gate.searches], scheduler
+
+    order, scheduler = asyncio.run(run())
+    assert order == ["busy", "greedy0", "modest", "greedy1", "greedy2", "greedy3", "greedy4"]
+    assert (scheduler.completed, scheduler.waiting) == (7, 0)
+
+
+def test_scheduler_rejects_past_maxqueue():
+    async def run():
+        scheduler, gate = gatedscheduler(maxqueue=2)
+        scheduler.start()
+        client = object()
+        running = asyncio.ensure_future(scheduler.submit(client, ["running"], 1.0))
+        await settle()
+        queued = [asyncio.ensure_future(scheduler.submit(client, [f"queued{n}"], 1.0)) for n in range(2)]
+        await settle()
+        with pytest.raises(Overloaded):
+            await scheduler.submit(client, ["rejected"], 1.0)
+        assert (scheduler.waiting, scheduler.rejected) == (2, 1)
+        while not all(job.done() for job in [running] + queued):
+            gate.finish()
+            await settle()
+        await scheduler.close()
+        return [job.result()[0] for job in [running] + queued], scheduler
+
+    results, scheduler = asyncio.run(run())
+    assert results == ["running", "queued0", "queued1"]
+    assert (scheduler.submitted, scheduler.completed) == (3, 3)
+
+
+def test_drop_cancels_queued_jobs():
+    async def run():
+        scheduler, gate = gatedscheduler()
+        scheduler.start()
+        gone, staying = object(), object()
+        busy = asyncio.ensure_future(scheduler.submit(staying, ["busy"], 1.0))
+        await settle()
+        dropped = [asyncio.ensure_future(scheduler.submit(gone, [f"gone{n}"], 1.0)) for n in range(3)]
+        later = asyncio.ensure_future(scheduler.submit(staying, ["later"], 1.0))
+        await settle()
+        assert scheduler.waiting == 4
+        scheduler.drop(gone)
+        await settle()
+        assert scheduler.waiting == 1
+        assert gone not in scheduler.queues and gone not in scheduler.order
+        assert all(job.cancelled() for job in dropped)
+        while not (busy.done() and later.done()):
+            gate.finish()
+            await settle()
+        await scheduler.close()
+        return [moves[0] for moves, _ in gate.searches], scheduler
+
+    searched, scheduler = asyncio.run(run())
+    assert searched == ["busy", "later"]
+    assert (scheduler.waiting, scheduler.completed) == (0, 2)
@@ -0,0 +1,78 @@
+import chess
+import chess.polyglot
+
+from openingbook import OpeningBook, buildbook, decodemove, encodemove
+
+GAMES = """[Result "1-0"]
+
+1. e4 e5 2. Nf3 Nc6 3. Bc4 Bc5 4. O-O Nf6 1-0
+
+[Result "1/2-1/2"]
+
+1. e4 e5 2. Nf3 Nc6 3. Bc4 Bc5 4. O-O Nf6 1/2-1/2
+
+[Result "1/2-1/2"]
+
+1. d4 d5 2. Nc3 Nc6 3. Bf4 Bf5 4. Qd2 Qd7 5. O-O-O O-O-O 1/2-1/2
+
+[Result "0-1"]
+
+1. c4 c5 0-1
+"""
+
+
+def boardafter(*sans: str) -> chess.Board:
+    board = chess.Board()
+    for san in sans:
+        board.push_san(san)
+    return board
+
+
+def weights(path, board: chess.Board) -> dict:
+    """{move: weight} of board's entries, as python-chess reads the book"""
+    with chess.polyglot.open_reader(str(path)) as reader:
+        return {entry.move.uci(): entry.weight for entry in reader.find_all(board)}
+
+
+def test_castling_is_king_takes_rook():
+    board = boardafter("e4", "e5", "Nf3", "Nc6", "Bc4", "Bc5")
+    assert encodemove(board, chess.Move.from_uci("e1g1")) == (chess.E1 << 6) | chess.H1
+    assert decodemove(board, (chess.E1 << 6) | chess.H1) == chess.Move.from_uci("e1g1")
+    board = boardafter("d4", "d5", "Nc3", "Nc6", "Bf4", "Bf5", "Qd2", "Qd7")
+    assert encodemove(board, chess.Move.from_uci("e1c1")) == (chess.E1 << 6) | chess.A1
+    assert decodemove(board, (chess.E1 << 6) | chess.A1) == chess.Move.from_uci("e1c1")
+
+
+def test_promotion_round_trip():
+    board = chess.Board("8/4P3/8/8/8/8/k6P/4K3 w - - 0 1")
+    for promotion in (chess.KNIGHT, chess.BISHOP, chess.ROOK, chess.QUEEN):
+        move = chess.Move(chess.E7, chess.E8, promotion)
+        assert decodemove(board, encodemove(board, move)) == move
+
+
+def test_built_book_reads_back_with_python_chess(tmp_path):
+    pgn = tmp_path / "games.pgn"
+    pgn.write_text(GAMES)
+    book = tmp_path / "book.bin"
+    assert buildbook([str(pgn)], str(book)) > 0
+
+    # A win scores 2, a draw 1, and 1. c4, which only ever lost, is left out.
+    assert weights(book, chess.Board()) == {"e2e4": 3, "d2d4": 1}
+    assert weights(book, boardafter("c4")) == {"c7c5": 2}
+    assert weights(book, boardafter("e4")) == {"e7e5": 1}
+
+    castles = boardafter("e4", "e5", "Nf3", "Nc6", "Bc4", "Bc5")
+    with chess.polyglot.open_reader(str(book)) as reader:
+        entry = reader.find(castles)
+    assert entry.raw_move == (chess.E1 << 6) | chess.H1
+    assert entry.move == chess.Move.from_uci("e1g1")
+    assert weights(book, boardafter("d4", "d5", "Nc3", "Nc6", "Bf4", "Bf5", "Qd2", "Qd7")) == {"e1c1": 1}
+    assert weights(book, boardafter("d4", "d5", "Nc3", "Nc6", "Bf4", "Bf5", "Qd2", "Qd7", "O-O-O")) == {"e8c8": 1}
+
+    opening = OpeningBook(str(book))
+    try:
+        assert opening.find(chess.Board()) == chess.Move.from_uci("e2e4")
+        assert opening.find(castles) == chess.Move.from_uci("e1g1")
+        assert opening.find(boardafter("c4", "c5")) is None
+    finally:
+        opening.close()
@@ -0,0 +1,40 @@
+import random
+
+import chess
+import pytest
+
+from bench import PERFT_POSITIONS
+from position import Position, perft
+
+
+@pytest.mark.parametrize("name,fen,expected", PERFT_POSITIONS, ids=[entry[0] for entry in PERFT_POSITIONS])
+def test_perft(name, fen, expected):
+    # Depth 4 of the smaller trees, depth 3 of the others, to keep the run short.
+    depth = 4 if expected[3] < 500000 else 3
+    assert perft(Position(chess.Board(fen)), depth) == expected[depth - 1]
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_moves_match_python_chess(seed):
+    rng = random.Random(seed)
+    fen = PERFT_POSITIONS[seed % len(PERFT_POSITIONS)][1]
+    board = chess.Board(fen)
+    position = Position(board.copy())
+    for _ in range(120):
+        moves = sorted(board.legal_moves, key=chess.Move.uci)
+        assert sorted(position.generate_legal(), key=chess.Move.uci) == moves, board.fen()
+        assert position.is_check() == board.is_check()
+        assert position.fen() == board.fen()
+        if not moves:
+            break
+        move = rng.choice(moves)
+        assert position.is_capture(move) == board.is_capture(move)
+        assert position.is_castling(move) == board.is_castling(move)
+        assert position.is_en_passant(move) == board.is_en_passant(move)
+        board.push(move)
+        position.push(move)
+    while board.move_stack:
+        board.pop()
+        position.pop()
+        assert position.fen() == board.fen()
+    assert position.to_board() == chess.Board(fen)
@@ -0,0 +1,70 @@
+import chess
+
+from ttable import ENTRY_BYTES, EXACT, LOWER, UPPER, TranspositionTable, Zobrist
+
+
+def smalltable(slots: int) -> TranspositionTable:
+    return TranspositionTable(slots * ENTRY_BYTES / (1024 * 1024))
+
+
+def test_store_and_probe():
+    table = smalltable(8)
+    move = chess.Move.from_uci("e2e4")
+    table.store(3, 4, 1.5, EXACT, move)
+    entry = table.probe(3)
+    assert entry is not None
+    assert (entry.key, entry.depth, entry.score, entry.bound, entry.move) == (3, 4, 1.5, EXACT, move)
+    assert table.probe(11) is None
+    assert (table.probes, table.hits) == (2, 1)
+
+
+def test_same_position_keeps_move_when_new_result_has_none():
+    table = smalltable(8)
+    move = chess.Move.from_uci("g1f3")
+    table.store(5, 2, 0.5, LOWER, move)
+    table.store(5, 3, 0.25, UPPER, None)
+    entry = table.probe(5)
+    assert entry.depth == 3 and entry.bound == UPPER and entry.move == move
+
+
+def test_deeper_entry_of_same_search_survives_collision():
+    table = smalltable(4)
+    table.store(1, 6, 1.0, EXACT, None)
+    table.store(5, 2, 2.0, EXACT, None)
+    assert table.probe(1) is not None
+    assert table.probe(5) is None
+    # Equal or greater depth replaces it.
+    table.store(5, 6, 2.0, EXACT, None)
+    assert table.probe(5) is not None
+    assert table.probe(1) is None
+
+
+def test_entries_of_older_searches_are_replaced():
+    table = smalltable(4)
+    table.store(1, 6, 1.0, EXACT, None)
+    table.newsearch()
+    table.store(5, 1, 2.0, EXACT, None)
+    assert table.probe(1) is None
+    assert table.probe(5).age == table.age
+
+
+def test_hashfull_and_clear():
+    table = smalltable(4)
+    for key in range(3):
+        table.store(key, 1, 0.0, EXACT, None)
+    table.store(0, 2, 0.0, EXACT, None)
+    assert table.hashfull() == 750
+    table.clear()
+    assert table.hashfull() == 0
+    assert table.probe(0) is None
+
+
+def test_incremental_key_matches_full_hash():
+    zobrist = Zobrist()
+    board = chess.Board("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1")
+    piecekey = zobrist.piecekey(board)
+    for move in list(board.legal_moves):
+        after = piecekey ^ zobrist.piecedelta(board, move)
+        board.push(move)
+        assert after ^ zobrist.statekey(board) == zobrist(board)
+        board.pop()
@@ -0,0 +1,133 @@
+import io
+import pytest
+import threading
+import time
+
+from position import Position
+from uci import UciDriver
+
+
+class Output(io.StringIO):
+    """stdout for the driver that a test can wait on"""
+
+    def __init__(self):
+        super().__init__()
+        self.written = threading.Condition()
+
+    def write(self, text: str) -> int:
+        with self.written:
+            count = super().write(text)
+            self.written.notify_all()
+        return count
+
+    def waitfor(self, prefix: str, timeout: float) -> str:
+        deadline = time.time() + timeout
+        with self.written:
+            while True:
+                for line in self.getvalue().splitlines():
+                    if line.startswith(prefix):
+                        return line
+                left = deadline - time.time()
+                if left <= 0:
+                    return ""
+                self.written.wait(left)
+
+
+def driver():
+    output = Output()
+    return UciDriver(stdin=io.StringIO(), stdout=output), output
+
+
+def test_ponderhit_right_after_go_ponder(monkeypatch):
+    # Slow the search setup down so the ponderhit surely arrives before it is done.
+    fromboard = Position.from_board.__func__
+
+    def slowfromboard(cls, board):
+        time.sleep(0.2)
+        return fromboard(cls, board)
+
+    monkeypatch.setattr(Position, "from_board", classmethod(slowfromboard))
+    uci, output = driver()
+    try:
+        uci.handle("position startpos moves e2e4 e7e5")
+        uci.handle("go ponder wtime 2000 btime 2000")
+        uci.handle("ponderhit")
+        assert output.waitfor("bestmove", 10)
+    finally:
+        uci.handle("quit")
+        uci.stopsearch()
+        uci.engine.close()
+
+
+def test_bad_commands_keep_the_previous_state():
+    uci, output = driver()
+    try:
+        uci.handle("position startpos moves e2e4")
+        for line in ("position startpos moves e2e4 e2e4", "position fen not/a/fen w - - 0 1",
+                     "position fen 4k3/4R3/8/8/8/8/8/4K3 w - - 0 1", "setoption name Hash value lots", "go depth deep"):
+            assert uci.handle(line)
+        assert output.getvalue().count("info string ignored") == 5
+        assert uci.board.fen() == "rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq - 0 1"
+        assert uci.engine.table.sizemb == 16
+        uci.handle("isready")
+        assert output.waitfor("readyok", 1)
+    finally:
+        uci.stopsearch()
+        uci.engine.close()
+
+
+def test_ponder_move_with_several_threads():
+    uci, output = driver()
+    try:
+        uci.handle("setoption name Threads value 2")
+        uci.handle("position startpos")
+        uci.handle("go depth 3")
+        line = output.waitfor("bestmove", 60)
+        assert " ponder " in line
+    finally:
+        uci.stopsearch()
+        uci.engine.close()
+
+
+def test_depth_caps_a_timed_search():
+    uci, output = driver()
+    try:
+        uci.handle("position startpos")
+        uci.handle("go wtime 60000 btime 60000 depth 2")
+        assert output.waitfor("bestmove", 30)
+        depths = [int(line.split()[2]) for line in output.getvalue().splitlines() if line.startswith("info depth")]
+        assert max(depths) == 2
+    finally:
+        uci.stopsearch()
+        uci.engine.close()
+
+
+def test_mate_score_counts_moves_to_mate():
+    uci, output = driver()
+    try:
+        uci.handle("position fen k7/8/2K5/8/8/8/8/1R6 w - - 0 1")
+        uci.handle("go depth 5")
+        assert output.waitfor("bestmove", 30)
+        assert "score mate 2 " in output.waitfor("info depth 3", 1)
+    finally:
+        uci.stopsearch()
+        uci.engine.close()
+
+
+@pytest.mark.parametrize("threads", [1, 2])
+def test_stop_ends_a_fixed_depth_search(threads):
+    uci, output = driver()
+    try:
+        uci.handle(f"setoption name Threads value {threads}")
+        uci.handle("position startpos moves e2e4 e7e5 g1f3")
+        uci.handle("go depth 8")
+        assert output.waitfor("info depth 1 ", 30)
+        # Well into an iteration that takes seconds to finish.
+        time.sleep(1.5)
+        started = time.time()
+        uci.handle("stop")
+        assert output.waitfor("bestmove", 1)
+        assert time.time() - started < 1
+    finally:
+        uci.stopsearch()
+        uci.engine.close()
@@ -0,0 +1,132 @@
+import chess
+import chess.polyglot
+from typing import List, NamedTuple, Optional, Tuple
+
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+# Rough footprint of one stored entry: the list slot, the tuple and its
+# small ints. Only used to turn a megabyte cap into a slot count.
+ENTRY_BYTES = 160
+
+PieceChange = Tuple[chess.Square, chess.Piece]
+
+
+class TTEntry(NamedTuple):
+    key: int
+    depth: int
+    score: float
+    bound: int
+    move: Optional[chess.Move]
+    age: int
+
+
+def piecechanges(board: chess.Board, move: chess.Move) -> Tuple[List[PieceChange], List[PieceChange]]:
+    """Pieces removed from and added to squares if move is played on board (before the push)"""
+    if not move:
+        return [], []
+
+    piece = board.piece_at(move.from_square)
+    removed = [(move.from_square, piece)]
+    added = []
+
+    if board.is_castling(move):
+        rank = chess.square_rank(move.from_square)
+        if board.is_kingside_castling(move):
+            rookfrom, rookto, kingto = chess.square(7, rank), chess.square(5, rank), chess.square(6, rank)
+        else:
+            rookfrom, rookto, kingto = chess.square(0, rank), chess.square(3, rank), chess.square(2, rank)
+        rook = chess.Piece(chess.ROOK, piece.color)
+        removed.append((rookfrom, rook))
+        added.append((kingto, piece))
+        added.append((rookto, rook))
+        return removed, added
+
+    if board.is_en_passant(move):
+        capsquare = move.to_square - 8 if piece.color == chess.WHITE else move.to_square + 8
+        removed.append((capsquare, chess.Piece(chess.PAWN, not piece.color)))
+    else:
+        captured = board.piece_at(move.to_square)
+        if captured:
+            removed.append((move.to_square, captured))
+
+    added.append((move.to_square, chess.Piece(move.promotion, piece.color) if move.promotion else piece))
+    return removed, added
+
+
+class Zobrist:
+    """Polyglot compatible Zobrist keys, with the piece part updated incrementally"""
+
+    def __init__(self):
+        self.hasher = chess.polyglot.ZobristHasher(chess.polyglot.POLYGLOT_RANDOM_ARRAY)
+        self.array = self.hasher.array
+
+    def piecekey(self, board: chess.Board) -> int:
+        return self.hasher.hash_board(board)
+
+    def piecedelta(self, board: chess.Board, move: chess.Move) -> int:
+        return self.changedelta(*piecechanges(board, move))
+
+    def changedelta(self, removed: List[PieceChange], added: List[PieceChange]) -> int:
+        delta = 0
+        for square, piece in removed + added:
+            delta ^= self.array[64 * ((piece.piece_type - 1) * 2 + piece.color) + square]
+        return delta
+
+    def statekey(self, board: chess.Board) -> int:
+        return self.hasher.hash_castling(board) ^ self.hasher.hash_ep_square(board) ^ self.hasher.hash_turn(board)
+
+    def __call__(self, board: chess.Board) -> int:
+        return self.hasher(board)
+
+
+class TranspositionTable:
+    """Fixed size hash table of search results, indexed by Zobrist key.
+
+    A slot is overwritten when it is empty, holds the same position, was
+    written by an older search, or holds a result that is not deeper than
+    the new one. The table lives on the engine so it carries over between
+    moves of the same game; call clear() for a new game.
+    """
+
+    def __init__(self, sizemb: float = 16):
+        self.resize(sizemb)
+
+    def resize(self, sizemb: float):
+        self.sizemb = sizemb
+        self.capacity = max(1, int(sizemb * 1024 * 1024) // ENTRY_BYTES)
+        self.clear()
+
+    def clear(self):
+        self.slots: List[Optional[TTEntry]] = [None] * self.capacity
+        self.age = 0
+        self.used = 0
+        self.probes = 0
+        self.hits = 0
+
+    def newsearch(self):
+        self.age += 1
+
+    def probe(self, key: int) -> Optional[TTEntry]:
+        self.probes += 1
+        entry = self.slots[key % self.capacity]
+        if entry is not None and entry.key == key:
+            self.hits += 1
+            return entry
+        return None
+
+    def store(self, key: int, depth: int, score: float, bound: int, move: Optional[chess.Move]):
+        index = key % self.capacity
+        old = self.slots[index]
+        if old is None:
+            self.used += 1
+        elif old.key != key and old.age == self.age and old.depth > depth:
+            return
+        elif old.key == key and move is None:
+            move = old.move
+        self.slots[index] = TTEntry(key, depth, score, bound, move, self.age)
+
+    def hashfull(self) -> int:
+        """Per mille of slots in use, like the UCI hashfull field"""
+        return self.used * 1000 // self.capacity
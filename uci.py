@@ -0,0 +1,197 @@
+import chess
+import math
+import multiprocessing
+import sys
+import threading
+from typing import List, Optional, TextIO
+
+from kewgame import TimeControl
+from parallel import ParallelCompooterchess
+from searchstats import SearchResult
+from searchthread import SearchThread
+
+ENGINE_NAME = "Compooterchess"
+ENGINE_AUTHOR = "Waleed Abdullah"
+MAX_HASH_MB = 4096
+
+
+class UciDriver:
+    """UCI front-end around one long-lived engine.
+
+    Commands are read on the calling thread while searches run on a
+    SearchThread, so isready, stop and ponderhit are answered at once even
+    mid-search. The engine (and its transposition table, history and worker
+    pool) lives for the whole session, so nothing is rebuilt between moves or
+    games; ucinewgame only forgets the killer and history tables.
+    """
+
+    def __init__(self, stdin: TextIO = sys.stdin, stdout: TextIO = sys.stdout, hashmb: int = 16, threads: int = 1):
+        self.stdin = stdin
+        self.stdout = stdout
+        self.lock = threading.Lock()
+        # Forked workers would deadlock closing the stdin this thread sits reading, so spawn them.
+        self.engine = ParallelCompooterchess(workers=threads, hashmb=hashmb, startmethod="spawn", info=self.sendinfo)
+        self.defaultdepth = self.engine.thinkinlevel
+        self.board = chess.Board()
+        self.thread: Optional[SearchThread] = None
+        self.searchboard = self.board
+        # Time the search gets once a ponder search is hit.
+        self.pondertime: Optional[float] = None
+
+    def send(self, line: str):
+        with self.lock:
+            self.stdout.write(line + "\n")
+            self.stdout.flush()
+
+    def loop(self):
+        for line in self.stdin:
+            if not self.handle(line):
+                break
+        self.stopsearch()
+        self.engine.close()
+
+    def handle(self, line: str) -> bool:
+        """Run one command; returns False on quit"""
+        words = line.split()
+        if not words:
+            return True
+        try:
+            return self.command(words[0], words[1:])
+        except ValueError as error:
+            # Bad FENs, illegal moves and non-numeric values leave the state as it was.
+            self.send(f"info string ignored {line.strip()!r}: {error}")
+            return True
+
+    def command(self, command: str, args: List[str]) -> bool:
+        if command == "uci":
+            self.send(f"id name {ENGINE_NAME}")
+            self.send(f"id author {ENGINE_AUTHOR}")
+            self.send(f"option name Hash type spin default {self.engine.table.sizemb:.0f} min 1 max {MAX_HASH_MB}")
+            self.send(f"option name Threads type spin default {self.engine.workers} min 1 "
+                      f"max {multiprocessing.cpu_count()}")
+            self.send("option name Ponder type check default false")
+            self.send("uciok")
+        elif command == "isready":
+            self.send("readyok")
+        elif command == "setoption":
+            self.setoption(args)
+        elif command == "ucinewgame":
+            self.stopsearch()
+            self.engine.orderer.clear()
+        elif command == "position":
+            self.stopsearch()
+            self.position(args)
+        elif command == "go":
+            self.go(args)
+        elif command == "stop":
+            self.stopsearch()
+        elif command == "ponderhit":
+            if self.thread is not None:
+                self.thread.ponderhit(self.pondertime)
+        elif command == "quit":
+            return False
+        return True
+
+    def setoption(self, args: List[str]):
+        text = " ".join(args)
+        if not text.startswith("name ") or " value " not in text:
+            return
+        name, value = text[5:].split(" value ", 1)
+        name = name.strip().lower()
+        self.stopsearch()
+        if name == "hash":
+            sizemb = max(1, min(MAX_HASH_MB, int(value)))
+            self.engine.table.resize(sizemb)
+            self.engine.workeroptions["hashmb"] = sizemb
+            self.engine.close()
+        elif name == "threads":
+            self.engine.workers = max(1, int(value))
+            self.engine.close()
+
+    def position(self, args: List[str]):
+        if not args:
+            return
+        moves = args.index("moves") if "moves" in args else len(args)
+        if args[0] == "startpos":
+            board = chess.Board()
+        elif args[0] == "fen":
+            board = chess.Board(" ".join(args[1:moves]))
+        else:
+            return
+        if not board.is_valid():
+            raise ValueError("invalid position")
+        for uci in args[moves + 1:]:
+            board.push_uci(uci)
+        self.board = board
+
+    def go(self, args: List[str]):
+        self.stopsearch()
+        options = {}
+        flags = set()
+        words = iter(args)
+        for word in words:
+            if word in ("infinite", "ponder"):
+                flags.add(word)
+            elif word == "searchmoves":
+                break
+            else:
+                options[word] = next(words, "0")
+
+        white = self.board.turn == chess.WHITE
+        clock = options.get("wtime" if white else "btime")
+        limits = {}
+        if "movetime" in options:
+            limits["timelimit"] = int(options["movetime"]) / 1000
+        elif clock is not None:
+            increment = options.get("winc" if white else "binc", "0")
+            movestogo = int(options["movestogo"]) if "movestogo" in options else None
+            timecontrol = TimeControl(int(clock) / 1000, int(increment) / 1000, movestogo)
+            limits["timelimit"] = timecontrol.budget(self.board)
+        if "nodes" in options:
+            limits["nodelimit"] = int(options["nodes"])
+        if "depth" in options:
+            # Also a cap on timed searches, not just the fixed depth.
+            limits["depthlimit"] = int(options["depth"])
+        self.engine.thinkinlevel = int(options.get("depth", self.defaultdepth))
+
+        ponder = bool(flags)
+        self.pondertime = limits.get("timelimit") if "ponder" in flags else None
+        if ponder:
+            limits = {}
+        self.searchboard = self.board.copy()
+        self.thread = SearchThread(self.engine, self.board, self.bestmove, ponder=ponder, **limits)
+        self.thread.start()
+
+    def stopsearch(self):
+        if self.thread is not None:
+            self.thread.stop()
+            self.thread = None
+
+    def bestmove(self, move: Optional[chess.Move], elapsed: float):
+        if move is None:
+            self.send("bestmove 0000")
+            return
+        board = self.searchboard
+        board.push(move)
+        reply = self.engine.expectedmove(board)
+        board.pop()
+        self.send(f"bestmove {move.uci()}" + (f" ponder {reply.uci()}" if reply else ""))
+
+    def sendinfo(self, result: SearchResult):
+        if abs(result.score) == math.inf:
+            mine = result.score > 0 if self.searchboard.turn == chess.WHITE else result.score < 0
+            # Without the line the search found, the deepest mate it could have seen.
+            plies = result.mateply or result.depth
+            moves = (plies + 1) // 2
+            score = f"mate {moves if mine else -moves}"
+        else:
+            # Evaluator units are tenths of a pawn.
+            sign = 1 if self.searchboard.turn == chess.WHITE else -1
+            score = f"cp {round(result.score * 10 * sign)}"
+        self.send(f"info depth {result.depth} score {score} nodes {result.nodes} nps {result.nps:.0f} "
+                  f"time {result.seconds * 1000:.0f} hashfull {self.engine.table.hashfull()}"
+                  + (f" pv {result.move.uci()}" if result.move else ""))
+
+
+if __name__ == "__main__":
+    UciDriver().loop()